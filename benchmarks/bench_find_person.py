@@ -0,0 +1,49 @@
+"""
+Benchmark Amity.find_person_by_name query latency as headcount grows.
+
+Usage: python -m benchmarks.bench_find_person [<size>...]
+"""
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+
+from benchmarks.data import random_name
+from mod_amity.amity import Amity
+
+QUERIES = 200
+
+
+def run(size, seed=0):
+    rng = random.Random(seed)
+    amity = Amity()
+
+    for i in range(size):
+        if i % 2:
+            amity.create_staff(random_name(rng))
+        else:
+            amity.create_fellow(random_name(rng))
+
+    people = list(amity.people.values())
+    queries = []
+    for i in range(QUERIES):
+        name = rng.choice(people).name
+        start = rng.randint(0, len(name) - 4)
+        queries.append(name[start:start + 4])
+
+    # index everyone up front so only query latency is measured
+    amity.name_index.flush()
+
+    start = timeit.default_timer()
+    for query in queries:
+        amity.find_person_by_name(query)
+    elapsed = timeit.default_timer() - start
+
+    return elapsed / QUERIES
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+    for size in sizes:
+        print("{:>9} people: {:9.1f} us/query".format(size, run(size) * 1e6))
@@ -0,0 +1,55 @@
+"""
+Benchmark parsing a people file with 1/2/4/8 worker processes, and a full load_people with each.
+
+Usage: python -m benchmarks.bench_ingest [<size>]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import timeit
+
+from benchmarks.data import write_people_file
+from mod_amity.amity import Amity
+from mod_amity.util.file import FileUtil
+
+WORKERS = [1, 2, 4, 8]
+
+
+def parse(file_name, workers):
+    if workers > 1:
+        entries = FileUtil.parse_file_parallel(file_name, workers, range_size=1024 * 1024)
+    else:
+        entries = FileUtil.parse_file(file_name)
+
+    start = timeit.default_timer()
+    for entry in entries:
+        pass
+    return timeit.default_timer() - start
+
+
+def load(file_name, workers):
+    amity = Amity()
+    for i in range(1000):
+        amity.create_office("office-{}".format(i))
+        amity.create_living_space("living-{}".format(i))
+
+    start = timeit.default_timer()
+    amity.load_people(file_name, seed=0, workers=workers)
+    return timeit.default_timer() - start
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    handle, file_name = tempfile.mkstemp(suffix=".txt")
+    os.close(handle)
+
+    try:
+        write_people_file(file_name, size)
+        print("{} lines, {:.1f} MB".format(size, os.path.getsize(file_name) / 1e6))
+        for workers in WORKERS:
+            print("{} worker(s): parse {:6.2f}s  load_people {:6.2f}s".format(
+                workers, parse(file_name, workers), load(file_name, workers)))
+    finally:
+        os.remove(file_name)
@@ -0,0 +1,35 @@
+"""
+Benchmark Amity.load_state with and without validation of the saved allocations.
+
+Usage: python -m benchmarks.bench_load [<size>...]
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from benchmarks.bench_save import build
+from mod_amity.amity import Amity
+
+
+def load(db_path, validate):
+    start = timeit.default_timer()
+    Amity().load_state(db_path, validate=validate)
+    return timeit.default_timer() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    directory = tempfile.mkdtemp()
+
+    try:
+        for size in sizes:
+            db_path = os.path.join(directory, "amity-{}.sqlite".format(size))
+            build(size).save_state(db_path)
+            print("{:>9} people: load {:7.2f}s  validated {:7.2f}s".format(
+                size, load(db_path, validate=False), load(db_path, validate=True)))
+    finally:
+        shutil.rmtree(directory)
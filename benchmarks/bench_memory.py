@@ -0,0 +1,41 @@
+"""
+Measure memory per person and per room with tracemalloc (python 3).
+
+Usage: python -m benchmarks.bench_memory [<people>] [<rooms>]
+"""
+from __future__ import print_function
+
+import sys
+import tracemalloc
+
+from mod_amity.models import Office, LivingSpace, Fellow, Staff
+
+
+def peak(build):
+    tracemalloc.start()
+    objects = build()
+    current, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return peak_size
+
+
+def build_people(size):
+    # names share one string so only the model objects are measured
+    return lambda: [Fellow("Tana Lopez", accommodation='Y', id=i) if i % 2 else Staff("Tana Lopez", id=i)
+                    for i in range(size)]
+
+
+def build_rooms(size):
+    return lambda: [Office("room") if i % 2 else LivingSpace("room") for i in range(size)]
+
+
+if __name__ == '__main__':
+    people = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rooms = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    people_peak = peak(build_people(people))
+    rooms_peak = peak(build_rooms(rooms))
+    print("{} people: peak {:.1f} MB, {:.0f} bytes/person".format(people, people_peak / 1e6,
+                                                                   float(people_peak) / people))
+    print("{} rooms: peak {:.1f} MB, {:.0f} bytes/room".format(rooms, rooms_peak / 1e6, float(rooms_peak) / rooms))
@@ -0,0 +1,68 @@
+"""
+Benchmark streaming print_allocations reports on large campuses: time to first byte, total time and peak memory
+allocated while writing, for each report format.
+
+Usage: python -m benchmarks.bench_report [<rooms>...]
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from benchmarks.bench_save import build
+from mod_amity.util.report import REPORT_FORMATS, write_allocations
+
+
+class TimedFile(object):
+    """
+    file wrapper that records when the first byte was written
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.first_write = None
+
+    def write(self, data):
+        if self.first_write is None:
+            self.first_write = timeit.default_timer()
+        self.out.write(data)
+
+
+def run(amity, report_format, directory):
+    sections = [("Offices", amity.rooms.offices), ("Living Spaces", amity.rooms.living_spaces)]
+    path = os.path.join(directory, "report." + report_format)
+
+    with open(path, 'w') as out:
+        timed = TimedFile(out)
+        start = timeit.default_timer()
+        write_allocations(timed, sections, report_format)
+        elapsed = timeit.default_timer() - start
+
+    # memory is traced on a second run, tracing slows allocations down too much to time them
+    with open(path, 'w') as out:
+        tracemalloc.start()
+        write_allocations(out, sections, report_format)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return timed.first_write - start, elapsed, peak
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    directory = tempfile.mkdtemp()
+
+    try:
+        for size in sizes:
+            # build sizes campuses by headcount, about one room per 3.4 people
+            amity = build(int(size * 3.4))
+            for report_format in sorted(REPORT_FORMATS):
+                first_byte, elapsed, peak = run(amity, report_format, directory)
+                print("{:>7} rooms {:>5}: first byte {:7.2f}ms  total {:6.2f}s  peak {:7.1f}KB".format(
+                    size, report_format, first_byte * 1e3, elapsed, peak / 1024.0))
+    finally:
+        shutil.rmtree(directory)
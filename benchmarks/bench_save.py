@@ -0,0 +1,53 @@
+"""
+Benchmark DbUtil.save_to_db bulk inserts against the ORM path.
+
+Usage: python -m benchmarks.bench_save [<size>...]
+"""
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+from benchmarks.data import random_name
+from mod_amity.amity import Amity
+from mod_amity.util.db import DbUtil
+
+
+def build(size, seed=0):
+    rng = random.Random(seed)
+    amity = Amity()
+    for i in range(size // 6 + 1):
+        amity.create_office("office-{}".format(i))
+    for i in range(size // 8 + 1):
+        amity.create_living_space("living-{}".format(i))
+
+    people = [amity.add_person(random_name(rng), rng.choice(["FELLOW", "STAFF"]), rng.choice("YN"),
+                               allocate=False) for i in range(size)]
+    amity.allocate_batch(people, seed=seed)
+
+    return amity
+
+
+def save(amity, db_path, bulk):
+    db_util = DbUtil(db_path)
+    start = timeit.default_timer()
+    db_util.save_to_db(rooms=list(amity.rooms), people={'fellows': amity.fellows, 'staff': amity.staff}, bulk=bulk)
+    return timeit.default_timer() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    directory = tempfile.mkdtemp()
+
+    try:
+        for size in sizes:
+            amity = build(size)
+            bulk = save(amity, os.path.join(directory, "bulk-{}.sqlite".format(size)), bulk=True)
+            orm = save(amity, os.path.join(directory, "orm-{}.sqlite".format(size)), bulk=False)
+            print("{:>9} people: bulk {:7.2f}s  orm {:7.2f}s  ({:.1f}x)".format(size, bulk, orm, orm / bulk))
+    finally:
+        shutil.rmtree(directory)
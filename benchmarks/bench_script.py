@@ -0,0 +1,98 @@
+"""
+Benchmark run.py --script against calling the Amity API directly for the same commands: creating rooms, adding
+people and relocating them. Script output goes to /dev/null, so this measures command dispatch, argument parsing
+and output formatting on top of the API. Parsing the command grammars on every line, as docopt() does, is timed
+on its own for comparison.
+
+Usage: python -m benchmarks.bench_script [<commands>...]
+"""
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+from docopt import docopt
+
+import run
+from mod_amity.amity import Amity
+from mod_amity.util.grammar import Grammar
+
+
+def write_script(file_name, commands, seed=0):
+    """
+    :return: list of command lines written
+    """
+    rng = random.Random(seed)
+    rooms = max(commands // 100, 2)
+    lines = ["create_room office office-{}".format(i) for i in range(rooms)]
+    staff = 0
+    while len(lines) < commands:
+        if staff and rng.random() < 0.2:
+            lines.append("reallocate_person ST{:03d} office-{}".format(rng.randint(1, staff), rng.randrange(rooms)))
+        else:
+            staff += 1
+            lines.append("add_person First{} Last staff".format(staff))
+
+    with open(file_name, 'w') as script:
+        script.write("\n".join(lines) + "\n")
+    return lines
+
+
+def run_api(lines):
+    amity = Amity()
+    for line in lines:
+        words = line.split()
+        if words[0] == "create_room":
+            amity.create_office(words[2])
+        elif words[0] == "add_person":
+            amity.add_person("{} {}".format(words[1], words[2]), "STAFF")
+        else:
+            try:
+                amity.relocate_person(words[1], words[2])
+            except ValueError:
+                pass
+
+
+def run_script(file_name):
+    run.amity = Amity()
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            run.AmityRun().run_script(file_name)
+        finally:
+            sys.stdout = stdout
+
+
+def parse_lines(lines, parse):
+    for line in lines:
+        command, arguments = line.split(" ", 1)
+        parse(getattr(run.AmityRun, "do_" + command).__doc__, arguments)
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    directory = tempfile.mkdtemp()
+    grammars = {}
+
+    def parse_compiled(doc, arguments):
+        if doc not in grammars:
+            grammars[doc] = Grammar(doc)
+        return grammars[doc].parse(arguments)
+
+    try:
+        for size in sizes:
+            file_name = os.path.join(directory, "script-{}.txt".format(size))
+            lines = write_script(file_name, size)
+            api = timeit.timeit(lambda: run_api(lines), number=1)
+            script = timeit.timeit(lambda: run_script(file_name), number=1)
+            per_line = timeit.timeit(lambda: parse_lines(lines, docopt), number=1)
+            compiled = timeit.timeit(lambda: parse_lines(lines, parse_compiled), number=1)
+            print("{:>7} commands: api {:6.2f}s  script {:6.2f}s ({:.1f}x)  parsing docopt() {:6.2f}s  "
+                  "compiled {:6.2f}s".format(size, api, script, script / api, per_line, compiled))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,83 @@
+"""
+Benchmark service mode throughput with many concurrent clients. The service runs in its own process and each
+client sends requests one at a time, 1 in 5 a mutation and the rest reads.
+
+Usage: python -m benchmarks.bench_service [<clients>...]
+"""
+from __future__ import print_function
+
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import sys
+import timeit
+
+from benchmarks.bench_save import build
+from mod_amity.service import serve
+
+REQUESTS = 2000
+PEOPLE = 1000
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def requests(rng, rooms, count):
+    for i in range(count):
+        if rng.random() < 0.2:
+            yield {'op': 'add_person', 'args': {'first_name': 'Staff', 'last_name': str(i), 'role': 'staff'}}
+        else:
+            yield {'op': 'print_room', 'args': {'room': rng.choice(rooms)}}
+
+
+async def client(port, rooms, count, seed):
+    for attempt in range(50):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    for request in requests(random.Random(seed), rooms, count):
+        writer.write(json.dumps(request).encode('utf-8') + b"\n")
+        if not json.loads((await reader.readline()).decode('utf-8'))['ok']:
+            raise RuntimeError("request failed")
+    writer.close()
+
+
+async def run_clients(port, rooms, clients):
+    # one warm-up request so the timing starts once the service is listening
+    await client(port, rooms, 1, 0)
+
+    start = timeit.default_timer()
+    await asyncio.gather(*[client(port, rooms, REQUESTS // clients, seed) for seed in range(clients)])
+    return timeit.default_timer() - start
+
+
+def run(clients):
+    amity = build(PEOPLE)
+    rooms = [room.name for room in amity.rooms]
+    port = free_port()
+
+    server = multiprocessing.Process(target=serve, args=(amity, '127.0.0.1', port))
+    server.start()
+    try:
+        elapsed = asyncio.run(run_clients(port, rooms, clients))
+    finally:
+        server.terminate()
+        server.join()
+
+    return (REQUESTS // clients) * clients / elapsed
+
+
+if __name__ == '__main__':
+    counts = [int(count) for count in sys.argv[1:]] or [1, 10, 50]
+    for count in counts:
+        print("{:>5} clients: {:9.0f} requests/s".format(count, run(count)))
@@ -0,0 +1,35 @@
+"""
+Benchmark how long importing run.py takes in a fresh interpreter, i.e the startup cost of every cli invocation before
+a command runs. The interpreter's own startup is timed separately and subtracted.
+
+Usage: python -m benchmarks.bench_startup [<runs>]
+"""
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def best(code, runs):
+    """
+    :return: fastest of runs wall clock times of running code in a fresh interpreter, in seconds
+    """
+    times = []
+    for i in range(runs):
+        start = timeit.default_timer()
+        subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    interpreter = best("pass", runs)
+    run = best("import run", runs)
+    print("interpreter startup: {:6.1f}ms".format(interpreter * 1e3))
+    print("import run:          {:6.1f}ms".format((run - interpreter) * 1e3))
@@ -0,0 +1,55 @@
+"""
+Benchmark the cost of picking a room for allocate_person with each allocation strategy on a large campus. Rooms start
+with seeded random occupancy so every free seat bucket is in use. Scanning all rooms for the emptiest or fullest
+one, what least_loaded and best_fit would cost without the bucketed pools, is timed for comparison.
+
+Usage: python -m benchmarks.bench_strategy [<rooms>...]
+"""
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+
+from mod_amity.amity import Amity
+
+PICKS = 10000
+
+# picks timed for the linear scan, it is too slow to time as many
+SCANS = 20
+
+
+def build(rooms, strategy, seed=0):
+    rng = random.Random(seed)
+    amity = Amity(strategy=strategy, seed=seed)
+    for i in range(rooms):
+        amity.create_office("office-{}".format(i))
+    # fill every room to a random occupancy below capacity
+    for room in amity.rooms.offices:
+        for i in range(rng.randint(0, room.capacity - 1)):
+            room.allocate_space(amity.create_staff("staff", allocate=False))
+    return amity
+
+
+def run(amity):
+    people = [amity.create_staff("staff", allocate=False) for i in range(PICKS)]
+    start = timeit.default_timer()
+    for person in people:
+        amity.allocate_person(person)
+    return (timeit.default_timer() - start) / PICKS
+
+
+def scan(amity):
+    start = timeit.default_timer()
+    for i in range(SCANS):
+        min((room for room in amity.rooms.offices if not room.is_full()), key=lambda room: len(room.occupants))
+    return (timeit.default_timer() - start) / SCANS
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+
+    for size in sizes:
+        for strategy in Amity.STRATEGIES:
+            print("{:>7} rooms {:>12}: {:6.2f}us per pick".format(size, strategy, run(build(size, strategy)) * 1e6))
+        print("{:>7} rooms {:>12}: {:6.2f}us per pick".format(size, "linear scan", scan(build(size, 'random')) * 1e6))
@@ -0,0 +1,71 @@
+"""
+Benchmark relocation throughput of a thread safe Amity shared by many threads. Per-room locks are compared with
+one global lock around every call, with people crowded into few spare seats and spread thin.
+Under CPython's GIL threads cannot run amity code in parallel, so this measures locking overhead and contention
+rather than speedup.
+
+Usage: python -m benchmarks.bench_threads [<threads>...]
+"""
+from __future__ import print_function
+
+import random
+import sys
+import threading
+import timeit
+
+from benchmarks.data import random_name
+from mod_amity.amity import Amity
+
+RELOCATIONS = 20000
+PEOPLE = 2000
+
+
+def build(offices, thread_safe, seed=0):
+    rng = random.Random(seed)
+    amity = Amity(thread_safe=thread_safe)
+    for i in range(offices):
+        amity.create_office("office-{}".format(i))
+    for i in range(PEOPLE):
+        amity.create_staff(random_name(rng), allocate=False)
+    return amity
+
+
+def run(threads, offices, global_lock):
+    amity = build(offices, thread_safe=not global_lock)
+    amity.allocate_batch(list(amity.people.values()), seed=0)
+    people = list(amity.people)
+    rooms = [room.name for room in amity.rooms]
+    lock = threading.Lock() if global_lock else None
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for i in range(RELOCATIONS // threads):
+            person_id, room_name = rng.choice(people), rng.choice(rooms)
+            try:
+                if lock:
+                    with lock:
+                        amity.relocate_person(person_id, room_name)
+                else:
+                    amity.relocate_person(person_id, room_name)
+            except ValueError:
+                pass
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = timeit.default_timer()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return RELOCATIONS // threads * threads / (timeit.default_timer() - start)
+
+
+if __name__ == '__main__':
+    counts = [int(count) for count in sys.argv[1:]] or [1, 2, 4, 8]
+    # 2000 people fill 334 offices, 400 leaves room to move, 1000 spreads them thin
+    for offices in [400, 1000]:
+        for count in counts:
+            per_room = run(count, offices, global_lock=False)
+            global_ = run(count, offices, global_lock=True)
+            print("{:>5} offices {:>3} threads: per-room {:9.0f}/s  global {:9.0f}/s".format(
+                offices, count, per_room, global_))
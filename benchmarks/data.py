@@ -0,0 +1,25 @@
+"""
+Seeded synthetic data shared by the benchmarks
+"""
+from __future__ import print_function
+
+import random
+import string
+
+
+def random_name(rng):
+    return "{} {}".format(*["".join(rng.choice(string.ascii_lowercase) for i in range(rng.randint(4, 9))).title()
+                            for part in range(2)])
+
+
+def write_people_file(file_name, size, seed=0):
+    """
+    write a people file of size lines in the load_people format
+    """
+    rng = random.Random(seed)
+    with open(file_name, 'w') as file_handle:
+        for i in range(size):
+            if rng.random() < 0.5:
+                file_handle.write("{} STAFF\n".format(random_name(rng).upper()))
+            else:
+                file_handle.write("{} FELLOW {}\n".format(random_name(rng).upper(), rng.choice("YN")))
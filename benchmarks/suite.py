@@ -0,0 +1,279 @@
+"""
+Scalability suite for the core Amity operations with seeded synthetic data.
+
+Every case is run once at the smallest size to warm up, then timed at each size and reported as seconds per
+operation, the best of a few repeats since a busy machine only ever slows runs down. Besides the per-op cost, the scaling
+exponent between consecutive sizes is reported: how per-op cost grows with size, 0 for constant time per person or
+room, 1 when each operation scans everything i.e quadratic behaviour over a whole load.
+
+Run as python -m benchmarks.suite, i.e
+    python -m benchmarks.suite --sizes=1000,10000,100000,1000000 --output=results.json
+    python -m benchmarks.suite --check
+
+Usage:
+    suite [options]
+
+Options:
+    --sizes=<sizes>  comma separated sizes [default: 1000,10000,100000]
+    --cases=<cases>  comma separated case names, all if not given
+    --repeat=<count>  times each case is run at each size, the fastest run is reported [default: 3]
+    --output=<file>  write the results as JSON
+    --check  compare against the baseline, exit with status 1 on regressions
+    --baseline=<file>  results to compare against, the stored benchmarks/baseline.json if not given
+    --tolerance=<factor>  allowed slowdown of per-op cost against the baseline [default: 3.0]
+    --slack=<exponent>  allowed increase of the scaling exponent against the baseline [default: 0.5]
+"""
+from __future__ import print_function, division
+
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+from collections import OrderedDict
+
+from docopt import docopt
+
+from benchmarks.bench_save import build
+from benchmarks.data import random_name, write_people_file
+from mod_amity.amity import Amity
+
+# stored results to check against, regenerate with --output=benchmarks/baseline.json after an intended change
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baseline.json")
+
+# number of operations timed by cases that sample a fixed number of queries
+QUERIES = 1000
+
+
+def timed(operation, *args):
+    start = timeit.default_timer()
+    operation(*args)
+    return timeit.default_timer() - start
+
+
+def bench_create_rooms(size, directory):
+    amity = Amity()
+
+    def create():
+        for i in range(size):
+            if i % 2:
+                amity.create_office("office-{}".format(i))
+            else:
+                amity.create_living_space("living-{}".format(i))
+
+    return timed(create), size
+
+
+def bench_add_person(size, directory):
+    rng = random.Random(0)
+    amity = Amity()
+    for i in range(size // 6 + 1):
+        amity.create_office("office-{}".format(i))
+    for i in range(size // 8 + 1):
+        amity.create_living_space("living-{}".format(i))
+    people = [(random_name(rng), rng.choice(["FELLOW", "STAFF"]), rng.choice("YN")) for i in range(size)]
+
+    def add():
+        for name, role, accommodation in people:
+            amity.add_person(name, role, accommodation)
+
+    return timed(add), size
+
+
+def bench_load_people(size, directory):
+    file_name = os.path.join(directory, "people-{}.txt".format(size))
+    write_people_file(file_name, size)
+    amity = Amity()
+    for i in range(size // 6 + 1):
+        amity.create_office("office-{}".format(i))
+    for i in range(size // 8 + 1):
+        amity.create_living_space("living-{}".format(i))
+
+    return timed(amity.load_people, file_name, 'random', 0), size
+
+
+def bench_relocate_person(size, directory):
+    rng = random.Random(0)
+    amity = build(size)
+    staff = [person.id for person in amity.staff if person.office]
+    offices = [room.name for room in amity.rooms.offices]
+    moves = [(rng.choice(staff), rng.choice(offices)) for i in range(QUERIES)]
+
+    def relocate():
+        for person_id, room_name in moves:
+            try:
+                amity.relocate_person(person_id, room_name)
+            except ValueError:
+                pass
+
+    return timed(relocate), len(moves)
+
+
+def bench_find_person_by_name(size, directory):
+    rng = random.Random(0)
+    amity = build(size)
+    people = list(amity.people.values())
+    queries = []
+    for i in range(QUERIES):
+        name = rng.choice(people).name
+        start = rng.randint(0, len(name) - 4)
+        queries.append(name[start:start + 4])
+    amity.name_index.flush()
+
+    def find():
+        for query in queries:
+            amity.find_person_by_name(query)
+
+    return timed(find), len(queries)
+
+
+def bench_get_unallocated_persons(size, directory):
+    rng = random.Random(0)
+    amity = Amity()
+    # a tenth of the seats people need, so most stay unallocated
+    for i in range(size // 60 + 1):
+        amity.create_office("office-{}".format(i))
+    for i in range(size):
+        amity.add_person(random_name(rng), rng.choice(["FELLOW", "STAFF"]), rng.choice("YN"))
+
+    return timed(amity.get_unallocated_persons), size
+
+
+def bench_save_state(size, directory):
+    amity = build(size)
+    db_path = os.path.join(directory, "save-{}.sqlite".format(size))
+    elapsed = timed(amity.save_state, db_path)
+    amity.close()
+    return elapsed, size
+
+
+def bench_load_state(size, directory):
+    db_path = os.path.join(directory, "load-{}.sqlite".format(size))
+    amity = build(size)
+    amity.save_state(db_path)
+    amity.close()
+
+    amity = Amity()
+    elapsed = timed(amity.load_state, db_path)
+    amity.close()
+    return elapsed, size
+
+
+CASES = OrderedDict([
+    ('create_rooms', bench_create_rooms),
+    ('add_person', bench_add_person),
+    ('load_people', bench_load_people),
+    ('relocate_person', bench_relocate_person),
+    ('find_person_by_name', bench_find_person_by_name),
+    ('get_unallocated_persons', bench_get_unallocated_persons),
+    ('save_state', bench_save_state),
+    ('load_state', bench_load_state),
+])
+
+
+def best(case, size, directory, repeat):
+    """
+    run a case repeat times, each in a fresh directory so no run finds the files of the one before
+    :return: (seconds, ops) of the fastest run
+    """
+    return min((case(size, tempfile.mkdtemp(dir=directory)) for i in range(repeat)),
+               key=lambda result: result[0] / result[1])
+
+
+def run(cases, sizes, repeat=1):
+    """
+    :return: dict of case name to list of {'size', 'seconds', 'ops', 'per_op'} in size order
+    """
+    results = OrderedDict()
+    directory = tempfile.mkdtemp()
+    try:
+        for name in cases:
+            # the first run of a case pays for imports and caches, e.g sqlalchemy for the state cases
+            best(CASES[name], min(sizes), directory, 1)
+            results[name] = []
+            for size in sizes:
+                seconds, ops = best(CASES[name], size, directory, repeat)
+                results[name].append({'size': size, 'seconds': seconds, 'ops': ops, 'per_op': seconds / ops})
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+
+def exponents(points):
+    """
+    :param points: results of a case in size order
+    :return: list of (size, next size, exponent of per-op cost growth between them)
+    """
+    return [(first['size'], second['size'],
+             math.log(second['per_op'] / first['per_op']) / math.log(float(second['size']) / first['size']))
+            for first, second in zip(points, points[1:])]
+
+
+def check(results, baseline, tolerance, slack):
+    """
+    compare results to baseline results
+    :return: list of regression messages
+    """
+    regressions = []
+    for name, points in results.items():
+        expected = dict((point['size'], point) for point in baseline.get(name, []))
+        for point in points:
+            base = expected.get(point['size'])
+            if base and point['per_op'] > base['per_op'] * tolerance:
+                regressions.append("{} at {}: {:.2f}us per op, baseline {:.2f}us".format(
+                    name, point['size'], point['per_op'] * 1e6, base['per_op'] * 1e6))
+
+        base_exponents = dict(((low, high), exponent) for low, high, exponent in
+                              exponents(baseline.get(name, [])))
+        for low, high, exponent in exponents(points):
+            # per-op cost falling with size at small sizes is noise, it must not tighten the bound
+            allowed = max(base_exponents.get((low, high), 0.0), 0.0) + slack
+            if exponent > allowed:
+                regressions.append("{} from {} to {}: per-op cost grows as size^{:.2f}, allowed {:.2f}".format(
+                    name, low, high, exponent, allowed))
+
+    return regressions
+
+
+def report(results):
+    for name, points in results.items():
+        growth = dict(((low, high), exponent) for low, high, exponent in exponents(points))
+        previous = None
+        for point in points:
+            exponent = growth.get((previous, point['size']))
+            print("{:<24} {:>8} {:>10.2f}us/op {:>9.3f}s total  {}".format(
+                name, point['size'], point['per_op'] * 1e6, point['seconds'],
+                "" if exponent is None else "size^{:+.2f}".format(exponent)))
+            previous = point['size']
+
+
+if __name__ == '__main__':
+    options = docopt(__doc__)
+    sizes = [int(size) for size in options['--sizes'].split(",")]
+    cases = options['--cases'].split(",") if options['--cases'] else list(CASES)
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        sys.exit("unknown cases: {}".format(", ".join(unknown)))
+
+    results = run(cases, sizes, int(options['--repeat']))
+    report(results)
+
+    if options['--output']:
+        with open(options['--output'], 'w') as out:
+            json.dump({'python': platform.python_version(), 'results': results}, out, indent=2)
+
+    if options['--check']:
+        baseline_path = options['--baseline'] or BASELINE
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = check(results, baseline, float(options['--tolerance']), float(options['--slack']))
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against {}".format(baseline_path))
@@ -1,11 +1,17 @@
 from __future__ import print_function
 
+import heapq
 import os
 import random
+import threading
+from collections import OrderedDict
 
+from mod_amity.locks import NULL_LOCK, room_locks
 from mod_amity.models import Office, LivingSpace, Fellow, Staff, Constants
-from mod_amity.util.db import DbUtil
+from mod_amity.registry import BucketPool, RoomRegistry, RoomPool
+from mod_amity.search import NameIndex
 from mod_amity.util.file import FileUtil as fileStorage
+from mod_amity.util.journal import Journal, SYNC_EVERY
 
 
 class Amity(object):
@@ -16,53 +22,179 @@ class Amity(object):
     from models.py. It also creates and perform operations to manage allocations on the available rooms in amity
     """
 
-    def __init__(self):
-        self.living_spaces = {'available': [], 'total': []}
-        self.offices = {'available': [], 'total': []}
+    BATCH_STRATEGIES = ('random', 'sequential', 'least_loaded', 'best_fit')
+
+    # how allocate_person picks a room with free space
+    STRATEGIES = ('random', 'least_loaded', 'best_fit')
+
+    def __init__(self, columnar=False, thread_safe=False, strategy='random', seed=None):
+        """
+        :param columnar: (optional) mirror occupancy in a numpy backed OccupancyStore for vectorized capacity queries
+        :param thread_safe: (optional) allow creating rooms and people, allocating and relocating from many threads.
+                            Each room has its own lock so allocations to different rooms run side by side, and the
+                            pools and id/name indexes have short lived guards. Loading and saving state are not
+                            thread safe
+        :param strategy: (optional) how rooms are picked, see set_strategy
+        :param seed: (optional) seed for reproducible random picks
+        """
+        if columnar and thread_safe:
+            raise ValueError("the columnar store cannot be shared across threads")
+        if strategy not in self.STRATEGIES:
+            raise ValueError("strategy should be one of {}".format(", ".join(self.STRATEGIES)))
+
+        self.thread_safe = thread_safe
+        self.strategy = strategy
+        self.rng = random.Random(seed)
+        # guards the room registry, id generation, people indexes, allocation sets and journal
+        self.index_lock = self.new_lock()
+
+        self.store = None
+        if columnar:
+            # numpy is only imported when the columnar store is used
+            from mod_amity.store import OccupancyStore
+            self.store = OccupancyStore()
+        self.rooms = RoomRegistry()
+        self.living_spaces = {'available': self.new_pool(), 'total': self.rooms.living_spaces}
+        self.offices = {'available': self.new_pool(), 'total': self.rooms.offices}
 
         self.fellows = []
         self.staff = []
+        self.people = {}
+        self.name_index = NameIndex()
         self.ids = {'fellow': [0], 'staff': [0]}
 
-        self.allocated_staff = []
-        self.allocated_fellows = []
+        self.allocated_staff = set()
+        self.allocated_fellows = set()
+        # insertion ordered sets of persons not fully allocated
+        self.unallocated_staff = OrderedDict()
+        self.unallocated_fellows = OrderedDict()
+
+        # names of rooms and ids of people changed since the last save/load of synced_db
+        self.dirty_rooms = set()
+        self.dirty_people = set()
+        self.synced_db = None
+        # open DbUtil of the last database used, see open_storage
+        self.storage = None
+        # append-only log of changes since the snapshot database was last written, see recover
+        self.journal = None
+        self.snapshot_db = None
+        # call counts and latencies, only collected after enable_stats
+        self.stats = None
+
+    def new_lock(self):
+        return threading.Lock() if self.thread_safe else NULL_LOCK
+
+    def new_pool(self, strategy=None, lock=None):
+        """
+        :param strategy: (optional) strategy the pool picks rooms by, amity's strategy if not given
+        :param lock: (optional) lock guarding the pool, a new one if amity is thread safe if not given
+        :return: empty pool of rooms with free space
+        """
+        strategy = strategy or self.strategy
+        lock = lock or self.new_lock()
+        if strategy == 'random':
+            return RoomPool(lock=lock)
+        return BucketPool(strategy, lock=lock)
 
-    def create_office(self, name):
-        if self.get_rooms(name) is not None:
-            raise ValueError("Room with same name exists")
-        self.offices["total"].append(Office(name))
+    def set_strategy(self, strategy, seed=None):
+        """
+        change how allocate_person picks rooms, as follows
+            random: any room with free space, equally likely
+            least_loaded: the room with the most free seats, spreading people evenly
+            best_fit: the room with the fewest free seats left, filling rooms one at a time
+        Every pick is O(1) in the number of rooms. The pools are rebuilt, so this is not safe while other threads
+        allocate
+        :param strategy: 'random', 'least_loaded' or 'best_fit'
+        :param seed: (optional) seed for reproducible random picks
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError("strategy should be one of {}".format(", ".join(self.STRATEGIES)))
+
+        self.strategy = strategy
+        self.rng = random.Random(seed)
+        self.offices["available"] = self.new_pool()
+        self.living_spaces["available"] = self.new_pool()
         self.check_room_availability()
 
+    def create_office(self, name):
+        self.add_room(Office(name))
+
     def create_living_space(self, name):
-        if self.get_rooms(name) is not None:
-            raise ValueError("Room with same name exists")
-        self.living_spaces["total"].append(LivingSpace(name))
-        self.check_room_availability()
+        self.add_room(LivingSpace(name))
+
+    def add_room(self, room):
+        """
+        register room and add it to the free pool of its type
+        :param room: Office/LivingSpace instance
+        :return: the room
+        """
+        room.lock = self.new_lock()
+        with self.index_lock:
+            self.rooms.add(room)
+            self.dirty_rooms.add(room.name)
+            self.record_room(room)
+        if self.store is not None:
+            self.store.add_room(room)
+
+        room.pool = self.get_pool(room.type)
+        if not room.is_full():
+            room.pool.add(room)
 
-    def add_person(self, name, role, accommodation=None):
+        return room
+
+    def get_pool(self, room_type):
+        """
+        :param room_type: Constants.OFFICE or Constants.LIVING_SPACE
+        :return: pool of rooms of the type with free space
+        """
+        if room_type == Constants.OFFICE:
+            return self.offices["available"]
+        return self.living_spaces["available"]
+
+    def add_person(self, name, role, accommodation=None, allocate=True):
 
         if role == Constants.STAFF.upper():
-            return self.create_staff(name)
+            return self.create_staff(name, allocate=allocate)
         elif role == Constants.FELLOW.upper():
             if accommodation:
-                return self.create_fellow(name, accommodation)
+                return self.create_fellow(name, accommodation, allocate=allocate)
             else:
-                return self.create_fellow(name)
-
-    def create_fellow(self, name, accommodation='N'):
-        fellow = Fellow(name, accommodation=accommodation, id=self.generate_fellow_id())
-        self.fellows.append(fellow)
-        self.allocate_person(fellow)
+                return self.create_fellow(name, allocate=allocate)
+
+    def create_fellow(self, name, accommodation='N', allocate=True):
+        with self.index_lock:
+            fellow = Fellow(name, accommodation=accommodation, id=self.generate_fellow_id())
+            self.fellows.append(fellow)
+            self.index_person(fellow)
+        if allocate:
+            self.allocate_person(fellow)
+        else:
+            self.check_person_allocation(fellow)
 
         return fellow
 
-    def create_staff(self, name):
-        staff = Staff(name, id=self.generate_staff_id())
-        self.staff.append(staff)
-        self.allocate_person(staff)
+    def create_staff(self, name, allocate=True):
+        with self.index_lock:
+            staff = Staff(name, id=self.generate_staff_id())
+            self.staff.append(staff)
+            self.index_person(staff)
+        if allocate:
+            self.allocate_person(staff)
+        else:
+            self.check_person_allocation(staff)
 
         return staff
 
+    def index_person(self, person):
+        """
+        add person to the id and name lookup indexes
+        :param person: fellow/staff instance
+        """
+        self.people[person.id] = person
+        self.name_index.add(person)
+        if self.store is not None:
+            self.store.add_person(person)
+
     def allocate_person(self, person):
         """
         assign space to fellow/staff as requested from the available rooms, as follows
@@ -71,32 +203,134 @@ class Amity(object):
         :param person: created person instance
         :return: person object with allocations, if any
         """
-        office = random.choice(self.offices["available"]) if len(self.offices["available"]) > 0 else None
-
-        if office:
-            office.allocate_space(person)
-            person.assign_office(office.name)
+        # allocate_space sets the person's rooms under the room's lock. Setting them again here, unlocked, could undo
+        # a relocation another thread made in between
+        self.allocate_from_pool(person, self.offices["available"])
 
         if person.role is Constants.FELLOW:
             if person.accommodation == 'Y':
-                living_space = random.choice(self.living_spaces["available"]) \
-                    if len(self.living_spaces["available"]) > 0 else None
-                if living_space:
-                    living_space.allocate_space(person)
-                    person.assign_living_space(living_space.name)
+                self.allocate_from_pool(person, self.living_spaces["available"])
 
         self.check_person_allocation(person)
-        self.check_room_availability()
 
         return person
 
+    def allocate_from_pool(self, person, pool):
+        """
+        allocate person space in the room pool picks. When shared across threads the picked room may fill up
+        before its lock is taken, in which case another room is picked
+        :return: the room or None if the pool is empty
+        """
+        while True:
+            room = pool.choice(self.rng)
+            if room is None:
+                return None
+
+            with room.lock:
+                full = room.is_full()
+                if not full:
+                    room.allocate_space(person)
+            if room.pool is not pool:
+                # rooms only re-file themselves in their own pool, i.e not in one built for a batch
+                pool.update(room)
+            if not full:
+                return room
+
+    def allocate_batch(self, people, strategy='random', seed=None, rng=None):
+        """
+        assign spaces to a cohort of people in one pass. The free slots of every available room are counted
+        up front and handed out in bulk, as follows
+            random: slots are sampled at random, rooms with more vacancies are more likely to be picked
+            sequential: rooms are filled in order of creation
+            least_loaded, best_fit: each person gets the room the strategy picks, see set_strategy
+        :param people: list of created person instances
+        :param strategy: (optional) 'random', 'sequential', 'least_loaded' or 'best_fit'
+        :param seed: (optional) seed for reproducible random allocations
+        :param rng: (optional) random number generator to use instead of seed, i.e to share across batches
+        :return: list of people with allocations, if any
+        """
+        if strategy not in self.BATCH_STRATEGIES:
+            raise ValueError("strategy should be one of {}".format(", ".join(self.BATCH_STRATEGIES)))
+
+        rng = rng or random.Random(seed)
+        people = list(people)
+
+        needs_living_space = [person for person in people
+                              if person.role == Constants.FELLOW and person.accommodation == 'Y']
+
+        for room_type, occupants in ((Constants.OFFICE, people), (Constants.LIVING_SPACE, needs_living_space)):
+            if strategy in BucketPool.ORDERS:
+                pool = self.get_pool(room_type)
+                if strategy != self.strategy:
+                    pool = BucketPool(strategy, pool)
+                for person in occupants:
+                    if self.allocate_from_pool(person, pool) is None:
+                        break
+            else:
+                slots = self.get_free_slots(room_type, len(occupants), strategy, rng)
+                for person, room in zip(occupants, slots):
+                    with room.lock:
+                        full = room.is_full()
+                        if not full:
+                            room.allocate_space(person)
+                    if full:
+                        # the slot was taken by another thread since it was counted, the pool picks another room
+                        self.allocate_from_pool(person, self.get_pool(room_type))
+
+        for person in people:
+            self.check_person_allocation(person)
+
+        return people
+
+    def get_free_slots(self, room_type, count, strategy='random', rng=random):
+        """
+        list up to count free slots in rooms of room_type, one entry per vacancy
+        :return: list of rooms
+        """
+        rooms = self.rooms.of_type(room_type)
+        if strategy == 'random':
+            rooms = self.get_pool(room_type)
+
+        slots = []
+        scanned = 0
+        for scanned, room in enumerate(rooms, 1):
+            slots.extend([room] * (room.capacity - len(room.occupants)))
+            if strategy == 'sequential' and len(slots) >= count:
+                break
+        self.count_scan('get_free_slots', scanned)
+
+        if strategy == 'random':
+            return rng.sample(slots, min(count, len(slots)))
+
+        return slots[:count]
+
     def get_unallocated_persons(self):
         """
         gets persons not fully allocated spaces
         :return: dict with  fellows and staff
         """
-        return {'staff': list(set(self.staff).symmetric_difference(set(self.allocated_staff))),
-                'fellows': list(set(self.fellows).symmetric_difference(set(self.allocated_fellows)))}
+        return {'staff': list(self.unallocated_staff), 'fellows': list(self.unallocated_fellows)}
+
+    def iter_unallocated(self, role, room_type=None):
+        """
+        stream persons missing a room without copying the unallocated sets
+        :param role: Constants.STAFF or Constants.FELLOW
+        :param room_type: (optional) only persons without a room of this type, fellows need a living space only if
+                          they requested accommodation. Not fully allocated persons if not given
+        :return: generator of persons
+        """
+        if room_type is None:
+            people = self.unallocated_staff if role == Constants.STAFF else self.unallocated_fellows
+        elif room_type == Constants.OFFICE:
+            people = (person for person in (self.staff if role == Constants.STAFF else self.fellows)
+                      if person.office is None)
+        elif role == Constants.FELLOW:
+            people = (person for person in self.fellows if person.accommodation == 'Y' and person.living_space is None)
+        else:
+            people = []
+
+        for person in people:
+            yield person
 
     def get_rooms(self, room_name=None):
         """
@@ -104,15 +338,44 @@ class Amity(object):
         :param room_name: (optional) filter the result by name
         :return: dict of all living_spaces and offices
         """
-        offices = self.offices["total"]
-        living_spaces = self.living_spaces["total"]
-        rooms = offices + living_spaces
         if room_name is not None:
-            for room in rooms:
-                if room.name == room_name:
-                    return room
-        else:
-            return {'living_spaces': living_spaces, 'offices': offices}
+            return self.rooms.get(room_name)
+
+        return {'living_spaces': self.rooms.living_spaces, 'offices': self.rooms.offices}
+
+    def get_free_rooms(self, room_type):
+        """
+        :param room_type: Constants.OFFICE or Constants.LIVING_SPACE
+        :return: list of rooms of room_type with free space
+        """
+        if self.store is not None:
+            return self.store.free_rooms(room_type)
+        rooms = self.rooms.of_type(room_type)
+        self.count_scan('get_free_rooms', len(rooms))
+        return [room for room in rooms if room in self.get_pool(room_type)]
+
+    def count_free_seats(self, room_type=None):
+        """
+        :param room_type: (optional) Constants.OFFICE or Constants.LIVING_SPACE, all rooms if not given
+        :return: total number of vacant spaces
+        """
+        if self.store is not None:
+            return self.store.free_seats(room_type)
+        rooms = self.rooms.of_type(room_type) if room_type else self.rooms
+        self.count_scan('count_free_seats', len(rooms))
+        return sum(room.capacity - len(room.occupants) for room in rooms)
+
+    def get_fullest_rooms(self, limit, room_type=None):
+        """
+        :param limit: number of rooms to return
+        :param room_type: (optional) Constants.OFFICE or Constants.LIVING_SPACE, all rooms if not given
+        :return: up to limit rooms with the highest share of occupied space, fullest first
+        """
+        if self.store is not None:
+            return self.store.fullest_rooms(limit, room_type)
+        rooms = self.rooms.of_type(room_type) if room_type else list(self.rooms)
+        self.count_scan('get_fullest_rooms', len(rooms))
+        return heapq.nlargest(limit, rooms, key=lambda room: float(len(room.occupants)) / room.capacity)
 
     def generate_staff_id(self):
         """
@@ -134,29 +397,42 @@ class Amity(object):
 
     def check_person_allocation(self, person):
         """
-        checks if fellow/staff is fully allocated and add to allocated list
+        checks if fellow/staff is fully allocated and moves them between the allocated and unallocated sets.
+        Called whenever a person's office or living space changes, so it also marks the person for saving
         :param person: an instance of fellow or staff
         :return:
         """
-        if person.role == Constants.STAFF:
-            if person.office is not None:
-                self.allocated_staff.append(person)
+        with self.index_lock:
+            self.dirty_people.add(person.id)
+            self.record_person(person)
+
+            if person.role == Constants.STAFF:
+                allocated, unallocated = self.allocated_staff, self.unallocated_staff
+                is_allocated = person.office is not None
 
-        elif person.role == Constants.FELLOW:
-            if person.living_space is not None and person.office is not None:
-                self.allocated_fellows.append(person)
+            elif person.role == Constants.FELLOW:
+                allocated, unallocated = self.allocated_fellows, self.unallocated_fellows
+                is_allocated = person.living_space is not None and person.office is not None
+
+            else:
+                return
+
+            if is_allocated:
+                allocated.add(person)
+                unallocated.pop(person, None)
+            else:
+                allocated.discard(person)
+                unallocated[person] = None
 
     def find_person_by_name(self, name):
         """
-        Search combined list of fellows and staff for partial match of name
+        Search fellows and staff for partial match of name using the name index
         :param name:
-        :return: List of person object matching name
+        :return: List of person object matching name, fellows first
         """
-        match = []
-        for person in (self.fellows + self.staff):
-            if name in person.name:
-                match.append(person)
-        return match
+        with self.index_lock:
+            matches = self.name_index.search(name)
+        return sorted(matches, key=lambda person: person.role != Constants.FELLOW)
 
     def find_person_by_id(self, person_id):
         """
@@ -164,9 +440,7 @@ class Amity(object):
         :param person_id:
         :return: Fellow/staff object on matching search
         """
-        for person in (self.fellows + self.staff):
-            if person.id == person_id:
-                return person
+        return self.people.get(person_id)
 
     def relocate_person(self, person_id, room_name):
         """
@@ -191,96 +465,541 @@ class Amity(object):
         if new_room.type == Constants.LIVING_SPACE and person.role == Constants.STAFF:
             raise ValueError("Cannot relocate staff member to Living Space")
 
-        old_room = None
+        while True:
+            old_room = None
 
-        if new_room.type == Constants.OFFICE:
-            old_room = self.get_rooms(person.office)
-        elif new_room.type == Constants.LIVING_SPACE and person.role == Constants.FELLOW:
-            old_room = self.get_rooms(person.living_space)
+            if new_room.type == Constants.OFFICE:
+                old_room = self.rooms.get(person.office)
+            elif new_room.type == Constants.LIVING_SPACE and person.role == Constants.FELLOW:
+                old_room = self.rooms.get(person.living_space)
 
-        # check new room is same types as new room
-        if not old_room:
-            raise ValueError("{} not currently allocated {} ".format(person.id, new_room.type))
+            # check new room is same types as new room
+            if not old_room:
+                raise ValueError("{} not currently allocated {} ".format(person.id, new_room.type))
 
-        if not old_room.type == new_room.type:
-            raise ValueError("can only relocate to rooms of same type")
+            if not old_room.type == new_room.type:
+                raise ValueError("can only relocate to rooms of same type")
 
-        for occupant in old_room.occupants:
-            if occupant.id == person_id:
-                old_room.occupants.remove(occupant)
-                new_room.allocate_space(occupant)
+            with room_locks(old_room, new_room):
+                # another thread may have moved the person or filled the room before the locks were taken
+                current = person.office if new_room.type == Constants.OFFICE else person.living_space
+                if current != old_room.name:
+                    continue
+                if new_room.is_full():
+                    raise ValueError("{} is full. Cannot relocate person".format(room_name))
 
-                if new_room.type == Constants.OFFICE:
-                    occupant.office = new_room.name
-                elif new_room.type == Constants.LIVING_SPACE:
-                    occupant.living_space = new_room.name
-                break
-        self.check_room_availability()
+                occupant = old_room.remove_occupant(person_id)
+                if occupant:
+                    new_room.allocate_space(occupant)
+
+                    if new_room.type == Constants.OFFICE:
+                        occupant.office = new_room.name
+                    elif new_room.type == Constants.LIVING_SPACE:
+                        occupant.living_space = new_room.name
+
+                    self.check_person_allocation(occupant)
 
-        return {'person': person.id, 'new_room': new_room.name, 'old_room': old_room.name}
+            return {'person': person.id, 'new_room': new_room.name, 'old_room': old_room.name}
+
+    def relocate_many(self, moves):
+        """
+        relocate many allocated persons as one transaction. The whole plan is checked before anyone moves, with room
+        capacities checked after all the moves so people can swap rooms. If applying the plan fails every move is
+        undone. The free pools are updated once for the rooms involved
+        :param moves: list of (person_id, room_name)
+        :return: list of dicts with person, new room and old room, in plan order
+        """
+        while True:
+            plan = self.plan_moves(moves)
+            rooms = set(room for person, old_room, new_room in plan for room in (old_room, new_room))
+
+            with room_locks(*rooms):
+                # when shared across threads, people and seats may have changed before the locks were taken
+                if self.thread_safe and self.plan_moves(moves) != plan:
+                    continue
+                self.apply_moves(plan, rooms)
+
+            return [{'person': person.id, 'new_room': new_room.name, 'old_room': old_room.name}
+                    for person, old_room, new_room in plan]
+
+    def plan_moves(self, moves):
+        """
+        check a relocation plan against the current allocations
+        :param moves: list of (person_id, room_name)
+        :return: list of (person, old room, new room)
+        """
+        plan = []
+        errors = []
+        planned = set()
+        arriving, leaving = OrderedDict(), {}
+
+        for person_id, room_name in moves:
+            person = self.find_person_by_id(person_id)
+            new_room = self.rooms.get(room_name)
+            old_room = None
+            error = None
+
+            if not new_room:
+                error = "cannot find room named {}".format(room_name)
+            elif not person:
+                error = "Cannot Find person with id " + person_id
+            elif new_room.type == Constants.LIVING_SPACE and person.role == Constants.STAFF:
+                error = "Cannot relocate staff member to Living Space"
+            else:
+                old_room = self.rooms.get(person.office if new_room.type == Constants.OFFICE else person.living_space)
+                if not old_room:
+                    error = "{} not currently allocated {} ".format(person.id, new_room.type)
+                elif (person.id, new_room.type) in planned:
+                    error = "{} is relocated more than once".format(person.id)
+
+            if error:
+                errors.append("{} -> {}: {}".format(person_id, room_name, error))
+                continue
+
+            planned.add((person.id, new_room.type))
+            plan.append((person, old_room, new_room))
+            if old_room is not new_room:
+                leaving[old_room] = leaving.get(old_room, 0) + 1
+                arriving[new_room] = arriving.get(new_room, 0) + 1
+
+        for room, count in arriving.items():
+            occupants = len(room.occupants) - leaving.get(room, 0) + count
+            if occupants > room.capacity:
+                errors.append("{} would have {} occupants, capacity is {}".format(room.name, occupants, room.capacity))
+
+        if errors:
+            raise ValueError("invalid relocation plan\n" + "\n".join(errors))
+
+        return plan
+
+    def apply_moves(self, plan, rooms):
+        """
+        move people as planned, moving everyone back if anything fails
+        :param plan: list of (person, old room, new room) from plan_moves
+        :param rooms: all rooms in the plan
+        """
+        moved = [(person, old_room, new_room) for person, old_room, new_room in plan if old_room is not new_room]
+        removed = []
+
+        try:
+            # everyone leaves before anyone arrives so swaps never overfill a room
+            for person, old_room, new_room in moved:
+                old_room.remove_occupant(person.id)
+                removed.append((person, old_room, new_room))
+            for person, old_room, new_room in moved:
+                new_room.add_occupant(person)
+                self.assign_room(person, new_room)
+        except Exception:
+            for person, old_room, new_room in removed:
+                new_room.remove_occupant(person.id)
+                old_room.add_occupant(person)
+                self.assign_room(person, old_room)
+            raise
+        finally:
+            for room in rooms:
+                room.pool.update(room)
+
+        for person, old_room, new_room in moved:
+            self.check_person_allocation(person)
+
+    @staticmethod
+    def assign_room(person, room):
+        if room.type == Constants.OFFICE:
+            person.office = room.name
+        else:
+            person.living_space = room.name
 
     def check_room_availability(self):
         """
-        check for state of room occupants and moves rooms to available as needed
+        rebuild the free pools from scratch. Allocations keep the pools up to date, so this is
+        only needed after rooms are replaced wholesale i.e loading state
         """
-        self.offices["available"] = []
-        self.living_spaces["available"] = []
-        for office in self.offices["total"]:
-            if not office.is_full():
-                self.offices["available"].append(office)
-        for living_space in self.living_spaces["total"]:
-            if not living_space.is_full():
-                self.living_spaces["available"].append(living_space)
+        self.offices["available"].clear()
+        self.living_spaces["available"].clear()
+        for room in self.rooms:
+            room.pool = self.get_pool(room.type)
+            if not room.is_full():
+                room.pool.add(room)
+        self.count_scan('check_room_availability', len(self.rooms))
+
+    def enable_stats(self):
+        """
+        start counting and timing the public operations, see util.stats
+        :return: Stats collecting the numbers
+        """
+        if self.stats is None:
+            from mod_amity.util.stats import Stats
+            self.stats = Stats(lock=self.new_lock())
+            self.stats.attach(self)
+        return self.stats
 
-    def load_people(self, file_name):
+    def disable_stats(self):
+        """
+        stop collecting stats, operations run without any timing code again
+        """
+        if self.stats is not None:
+            self.stats.detach(self)
+            self.stats = None
 
-        people = []
+    def count_scan(self, operation, rooms):
+        if self.stats is not None:
+            self.stats.scanned(operation, rooms)
 
-        for person in fileStorage.read_from_file(file_name):
-            name = " {} {}".format(person[0], person[1])
-            role = person[2].upper()
+    def load_people(self, file_name, strategy='random', seed=None, chunk_size=1000, workers=None):
+        """
+        add and allocate people listed in a file. see iter_load_people
+        :return: dict with count of loaded people and list of (line number, error) for malformed lines
+        """
+        errors = []
+        loaded = 0
 
-            accommodation = person[3] if len(person) > 3 else None
+        for person in self.iter_load_people(file_name, strategy=strategy, seed=seed, chunk_size=chunk_size,
+                                            errors=errors, workers=workers):
+            loaded += 1
 
-            people.append(self.add_person(name, role, accommodation))
+        return {'loaded': loaded, 'errors': errors}
 
-        return people
+    def iter_load_people(self, file_name, strategy='random', seed=None, chunk_size=1000, errors=None,
+                         workers=None):
+        """
+        stream people from a file, creating and allocating them chunk by chunk so memory stays bounded
+        :param file_name: path to people file
+        :param strategy: (optional) allocation strategy for allocate_batch
+        :param seed: (optional) seed for reproducible random allocations
+        :param chunk_size: (optional) number of people allocated per batch, 1 allocates line by line
+        :param errors: (optional) list to collect (line number, error) of malformed lines,
+                        if not given the first malformed line raises ValueError
+        :param workers: (optional) number of processes to parse the file with. ID generation and allocation
+                        stay in this process
+        :return: generator of allocated people in file order
+        """
+        rng = random.Random(seed)
+        chunk = []
+
+        if workers and workers > 1:
+            entries = fileStorage.parse_file_parallel(file_name, workers)
+        else:
+            entries = fileStorage.parse_file(file_name)
+
+        for line_number, person, error in entries:
+            if error is None:
+                try:
+                    chunk.append(self.add_person(*person, allocate=False))
+                except ValueError as ex:
+                    error = str(ex)
+
+            if error is not None:
+                if errors is None:
+                    raise ValueError("line {}: {}".format(line_number, error))
+                errors.append((line_number, error))
+
+            if len(chunk) >= chunk_size:
+                for person in self.allocate_batch(chunk, strategy=strategy, rng=rng):
+                    yield person
+                chunk = []
+
+        if chunk:
+            for person in self.allocate_batch(chunk, strategy=strategy, rng=rng):
+                yield person
 
     def save_state(self, db_path):
+        """
+        save rooms and people to sqlite database. If the database was the last one saved to or loaded from,
+        only rooms and people changed since then are written, otherwise the database is rewritten
+        :param db_path: path to sqlite database
+        """
+        if self.synced_db == os.path.realpath(db_path) and os.path.exists(db_path):
+            saved = self.save_changes(self.open_storage(db_path))
+        else:
+            existing = os.path.exists(db_path)
+            storage = self.open_storage(db_path)
+            if existing:
+                print("deleting previous state database")
 
-        if os.path.exists(db_path):
-            print("deleting previous state database")
-            os.remove(db_path)
+            # the previous state is deleted in the same transaction, a failed save leaves it as it was
+            saved = storage.save_to_db(rooms=list(self.rooms), people={'fellows': self.fellows, 'staff': self.staff},
+                                       replace=existing)
 
-        db_util = DbUtil(db_path)
+        self.mark_synced(db_path)
 
-        rooms = self.living_spaces["total"] + self.offices["total"]
+        return saved
 
-        return db_util.save_to_db(rooms=rooms, people={'fellows': self.fellows, 'staff': self.staff})
+    def save_changes(self, db_util):
+        """
+        upsert rooms and people changed since the last sync
+        :param db_util: DbUtil of the synced database
+        """
+        rooms = [self.rooms.get(name) for name in self.dirty_rooms]
+        people = {'fellows': [], 'staff': []}
+        for person_id in self.dirty_people:
+            person = self.people[person_id]
+            people['fellows' if person.role == Constants.FELLOW else 'staff'].append(person)
+
+        return db_util.upsert_to_db(rooms=rooms, people=people)
+
+    def open_storage(self, db_path):
+        """
+        get the storage handle for db_path. The handle is kept open and reused until a different database is used,
+        the file is removed or close() is called
+        :param db_path: path to sqlite database
+        :return: DbUtil
+        """
+        db_path = os.path.realpath(db_path)
 
-    def load_state(self, db_path):
+        if self.storage is not None and (self.storage.db_path != db_path or not os.path.exists(db_path)):
+            self.storage.close()
+            self.storage = None
+
+        if self.storage is None:
+            # sqlalchemy is only imported once a database is used, startup stays fast for everything else
+            from mod_amity.util.db import DbUtil
+            self.storage = DbUtil(db_path)
+
+        return self.storage
+
+    def close(self):
+        """
+        close the storage handle and the journal, if open
+        """
+        if self.storage is not None:
+            self.storage.close()
+            self.storage = None
 
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def mark_synced(self, db_path):
+        self.synced_db = os.path.realpath(db_path)
+        self.dirty_rooms.clear()
+        self.dirty_people.clear()
+
+    def load_state(self, db_path, validate=False):
+        """
+        replace the current state with the state saved in sqlite database
+        :param db_path: path to sqlite database
+        :param validate: (optional) re-run the room type and capacity checks for every saved allocation
+        """
         if not os.path.exists(db_path):
             raise ValueError("cannot open db at {} ".format(db_path))
 
-        db_util = DbUtil(db_path)
+        rows = self.open_storage(db_path).load_rows()
+
+        # the journal only holds changes on top of its snapshot and must not be folded into another database,
+        # journaling stops instead. Recovering the snapshot later still replays what was journaled
+        self.stop_journal()
+        self.hydrate(rows, validate=validate)
+        self.mark_synced(db_path)
+
+        return True
+
+    def hydrate(self, rows, validate=False):
+        """
+        rebuild rooms, occupants, indexes and availability from saved rows in a single pass
+        :param rows: dict of row tuples as returned by DbUtil.load_rows
+        :param validate: (optional) allocate through Room.allocate_space instead of restoring occupants directly
+        """
+        self.reset()
+
+        for name, room_type in rows['rooms']:
+            room = Office(str(name)) if room_type == Constants.OFFICE else LivingSpace(str(name))
+            room.lock = self.new_lock()
+            self.rooms.add(room)
+            if self.store is not None:
+                self.store.add_room(room)
+
+        for person_id, name, office, living_space, accommodation in rows['fellows']:
+            fellow = Fellow(name, accommodation=accommodation, id=person_id)
+            self.fellows.append(fellow)
+            self.index_person(fellow)
+            self.restore_allocation(fellow, office, Constants.OFFICE, validate)
+            self.restore_allocation(fellow, living_space, Constants.LIVING_SPACE, validate)
+            self.restore_person(fellow, 'fellow')
+
+        for person_id, name, office in rows['staff']:
+            staff = Staff(name, id=person_id)
+            self.staff.append(staff)
+            self.index_person(staff)
+            self.restore_allocation(staff, office, Constants.OFFICE, validate)
+            self.restore_person(staff, 'staff')
+
+        self.check_room_availability()
+
+    def recover(self, db_path, sync_every=SYNC_EVERY):
+        """
+        replace the current state with the snapshot in db_path plus the changes in its journal, then keep
+        journaling every change so it survives a crash. Changes reach the journal on commit
+        :param db_path: path to the snapshot sqlite database, need not exist yet
+        :param sync_every: (optional) number of commits between fsyncs of the journal
+        :return: number of journal records replayed
+        """
+        self.stop_journal()
+
+        if os.path.exists(db_path):
+            self.load_state(db_path)
+        else:
+            self.reset()
+            self.synced_db = None
+
+        journal_path = Journal.path_for(db_path)
+        replayed = self.replay(Journal.read(journal_path))
+
+        self.journal = Journal(journal_path, sync_every=sync_every)
+        self.snapshot_db = os.path.realpath(db_path)
+
+        return replayed
+
+    def stop_journal(self):
+        """
+        write the pending changes to the journal and close it, changes are no longer journaled after this
+        :return: the path of the snapshot database that was journaled to, None if there was no journal open
+        """
+        if self.journal is None:
+            return None
 
-        save_state = db_util.load_state()
+        self.journal.close()
+        snapshot_db, self.journal, self.snapshot_db = self.snapshot_db, None, None
+        return snapshot_db
 
-        if save_state:
+    def replay(self, records):
+        """
+        apply journal records on top of the current state
+        :param records: iterable of record dicts, see record_room and record_person
+        :return: number of records applied
+        """
+        applied = 0
+        journal, self.journal = self.journal, None
+        try:
+            for record in records:
+                if record['op'] == 'room':
+                    self.replay_room(record)
+                elif record['op'] == 'person':
+                    self.replay_person(record)
+                else:
+                    raise ValueError("unknown journal record {}".format(record['op']))
+                applied += 1
+        finally:
+            self.journal = journal
 
-            self.ids = save_state['current_ids']
-            self.living_spaces['total'] = save_state['living_spaces']
-            self.offices['total'] = save_state['offices']
+        self.check_room_availability()
 
-            self.fellows = save_state['fellows']
-            self.staff = save_state['staff']
+        return applied
 
-            for person in (self.fellows + self.staff):
-                self.check_person_allocation(person)
+    def replay_room(self, record):
+        if record['name'] in self.rooms:
+            return
+        name = str(record['name'])
+        self.add_room(Office(name) if record['type'] == Constants.OFFICE else LivingSpace(name))
 
-            self.check_room_availability()
+    def replay_person(self, record):
+        person = self.people.get(record['id'])
+        role_key = 'fellow' if record['role'] == Constants.FELLOW else 'staff'
 
-            return True
+        if person is None:
+            if role_key == 'fellow':
+                person = Fellow(record['name'], accommodation=record['accommodation'], id=record['id'])
+                self.fellows.append(person)
+            else:
+                person = Staff(record['name'], id=record['id'])
+                self.staff.append(person)
+            self.index_person(person)
+
+        self.replay_allocation(person, person.office, record['office'], Constants.OFFICE)
+        if role_key == 'fellow':
+            self.replay_allocation(person, person.living_space, record['living_space'], Constants.LIVING_SPACE)
+
+        self.restore_person(person, role_key)
+
+    def replay_allocation(self, person, current, room_name, room_type):
+        if current == room_name:
+            return
+
+        if current is not None:
+            self.rooms.get(current).remove_occupant(person.id)
+            if room_type == Constants.OFFICE:
+                person.office = None
+            else:
+                person.living_space = None
+
+        self.restore_allocation(person, room_name, room_type, validate=False)
+
+    def record_room(self, room):
+        if self.journal is not None:
+            self.journal.append(('room', room.name), {'op': 'room', 'name': room.name, 'type': room.type})
+
+    def record_person(self, person):
+        if self.journal is None:
+            return
+
+        record = {'op': 'person', 'id': person.id, 'name': person.name, 'role': person.role, 'office': person.office}
+        if person.role == Constants.FELLOW:
+            record['accommodation'] = person.accommodation
+            record['living_space'] = person.living_space
+
+        self.journal.append(('person', person.id), record)
+
+    def commit(self):
+        """
+        write the changes made since the last commit to the journal, if journaling
+        :return: number of records written
+        """
+        if self.journal is None:
+            return 0
+        with self.index_lock:
+            return self.journal.commit()
+
+    def compact(self):
+        """
+        fold the journal into the snapshot database and empty it. Only the rooms and people changed since the
+        snapshot are written. Replaying is idempotent, so a crash before the journal is emptied loses nothing
+        """
+        if self.journal is None:
+            raise ValueError("no journal open, recover a database first")
+
+        self.journal.commit()
+        saved = self.save_state(self.snapshot_db)
+        # a full rewrite of the snapshot is not synced as it is written, it must be on disk before the journal
+        # is emptied or a power loss could take both
+        self.open_storage(self.snapshot_db).sync()
+        self.journal.truncate()
+
+        return saved
+
+    def restore_allocation(self, person, room_name, room_type, validate):
+        room = self.rooms.get(room_name, room_type)
+        if room is None:
+            return
+
+        if validate:
+            room.allocate_space(person)
+        elif room_type == Constants.OFFICE:
+            room.add_occupant(person)
+            person.office = room.name
+        else:
+            room.add_occupant(person)
+            person.living_space = room.name
+
+    def restore_person(self, person, role_key):
+        self.check_person_allocation(person)
+        self.ids[role_key][0] = max(self.ids[role_key][0], int(person.id[2:]))
+
+    def reset(self):
+        """
+        remove all rooms and people
+        """
+        self.rooms.clear()
+        self.offices["available"].clear()
+        self.living_spaces["available"].clear()
+        if self.store is not None:
+            self.store.clear()
+
+        self.fellows = []
+        self.staff = []
+        self.people = {}
+        self.name_index.clear()
+        self.ids = {'fellow': [0], 'staff': [0]}
 
-        return False
+        self.allocated_staff.clear()
+        self.allocated_fellows.clear()
+        self.unallocated_staff.clear()
+        self.unallocated_fellows.clear()
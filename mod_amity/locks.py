@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+
+class NullLock(object):
+    """
+    Lock that does nothing, used by rooms, pools and indexes when amity is not shared across threads
+    """
+
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_LOCK = NullLock()
+
+
+@contextmanager
+def room_locks(*rooms):
+    """
+    hold the locks of rooms, taken in name order so threads locking overlapping rooms cannot deadlock
+    :param rooms: rooms to lock, repeats are locked once
+    """
+    ordered = sorted(set(rooms), key=lambda room: room.name)
+    held = []
+    try:
+        for room in ordered:
+            room.lock.acquire()
+            held.append(room)
+        yield
+    finally:
+        for room in reversed(held):
+            room.lock.release()
@@ -1,3 +1,6 @@
+from mod_amity.locks import NULL_LOCK
+
+
 class Constants(object):
     STAFF = "Staff"
     FELLOW = "Fellow"
@@ -10,13 +13,18 @@ class Person(object):
     Boiler-plate class for creating a person instance.
     Its inherited to form Fellows and Staff subclasses
     """
+    # slots instead of a per-instance __dict__ keep memory per person low. role is fixed per class
+    __slots__ = ('name', 'id', 'office', 'handle')
+    role = None
 
     def __init__(self, name, id=None):
         if name.strip() == " ":
             raise ValueError("name cannot empty")
 
         self.name, self.id = name, id
-        self.office, self.role = None, None
+        self.office = None
+        # position in the columnar occupancy store, if one is used
+        self.handle = None
 
     def assign_office(self, office_name):
         self.office = office_name
@@ -26,20 +34,20 @@ class Person(object):
 
 
 class Staff(Person):
-    def __init__(self, name, id=None):
-        super(Staff, self).__init__(name, id=id)
-        self.role = Constants.STAFF
-        self.office = None
+    __slots__ = ()
+    role = Constants.STAFF
 
 
 class Fellow(Person):
+    __slots__ = ('accommodation', 'living_space')
+    role = Constants.FELLOW
+
     def __init__(self, name, accommodation='N', id=None):
         super(Fellow, self).__init__(name, id=id)
         if accommodation not in ['N', 'Y']:
             raise ValueError("accommodation should be Y or N")
         self.accommodation = accommodation
-        self.office, self.living_space = None, None
-        self.role = Constants.FELLOW
+        self.living_space = None
 
     def assign_living_space(self, living_space):
         if self.accommodation == 'N':
@@ -52,6 +60,8 @@ class Room(object):
     Boiler plate class for the rooms available in amity.
     It defines the occupants of a room and the capacity of the room
     """
+    __slots__ = ('room_type', 'name', 'occupants', 'occupants_by_id', 'capacity', 'type', 'pool', 'store', 'handle',
+                 'lock')
 
     def __init__(self, name, capacity=None, room_type=None):
         self.room_type = room_type
@@ -62,8 +72,15 @@ class Room(object):
 
         self.name = name
         self.occupants = []
+        self.occupants_by_id = {}
         self.capacity = capacity
         self.type = room_type
+        # free-space pool the room belongs to, updated on every occupancy change
+        self.pool = None
+        # columnar occupancy store mirroring the room's occupancy, if one is used
+        self.store, self.handle = None, None
+        # guards occupancy when amity is shared across threads, see Amity(thread_safe=True)
+        self.lock = NULL_LOCK
 
     def allocate_space(self, person):
         if self.is_full():
@@ -71,7 +88,38 @@ class Room(object):
         if not isinstance(person, Person):
             raise TypeError("Rooms assigned to only fellow or staff")
 
+        self.add_occupant(person)
+
+        if self.pool is not None:
+            self.pool.update(self)
+
+    def add_occupant(self, person):
+        """
+        add occupant without the type and capacity checks or pool update, used when restoring saved state
+        """
         self.occupants.append(person)
+        self.occupants_by_id[person.id] = person
+        if self.store is not None:
+            self.store.occupy(self, person)
+
+    def remove_occupant(self, person_id):
+        """
+        remove occupant from the room and re-file it in its pool.
+        The id lookup is a dict access and the occupants list is bounded by the room capacity
+        :param person_id: id of the occupant
+        :return: removed person or None if not an occupant
+        """
+        occupant = self.occupants_by_id.pop(person_id, None)
+        if occupant is None:
+            return None
+
+        self.occupants.remove(occupant)
+        if self.store is not None:
+            self.store.vacate(self, occupant)
+        if self.pool is not None:
+            self.pool.update(self)
+
+        return occupant
 
     def is_full(self):
         return len(self.occupants) >= self.capacity
@@ -81,6 +129,7 @@ class Office(Room):
     """
     Office capacity limited to 6 occupants.
     """
+    __slots__ = ()
 
     def __init__(self, name):
         super(Office, self).__init__(name, 6, Constants.OFFICE)
@@ -95,6 +144,7 @@ class LivingSpace(Room):
     Living space to 4 occupants.
     Constraints: can only be assigned to fellows that requested accommodation
     """
+    __slots__ = ()
 
     def __init__(self, name):
         super(LivingSpace, self).__init__(name, 4, Constants.LIVING_SPACE)
@@ -0,0 +1,246 @@
+import random
+
+from mod_amity.locks import NULL_LOCK
+from mod_amity.models import Constants
+
+
+class RoomRegistry(object):
+    """
+    Name-indexed store of all the rooms in amity.
+    Rooms are kept in a dict keyed by name for constant time lookup and duplicate detection,
+    plus a list per room type so offices and living spaces can be listed without filtering
+    """
+
+    def __init__(self):
+        self._rooms = {}
+        self._by_type = {Constants.OFFICE: [], Constants.LIVING_SPACE: []}
+
+    def add(self, room):
+        """
+        register a new room
+        :param room: Office/LivingSpace instance
+        :return: the registered room
+        """
+        if room.name in self._rooms:
+            raise ValueError("Room with same name exists")
+
+        self._rooms[room.name] = room
+        self._by_type[room.type].append(room)
+
+        return room
+
+    def get(self, name, room_type=None):
+        """
+        get room by name
+        :param name: room name
+        :param room_type: (optional) only return the room if it is of this type
+        :return: room object or None if there is no match
+        """
+        room = self._rooms.get(name)
+
+        if room is not None and room_type is not None and room.type != room_type:
+            return None
+
+        return room
+
+    def of_type(self, room_type):
+        """
+        typed view of the registry
+        :param room_type: Constants.OFFICE or Constants.LIVING_SPACE
+        :return: list of rooms of the type, in order of creation
+        """
+        return self._by_type[room_type]
+
+    @property
+    def offices(self):
+        return self._by_type[Constants.OFFICE]
+
+    @property
+    def living_spaces(self):
+        return self._by_type[Constants.LIVING_SPACE]
+
+    def clear(self):
+        """
+        remove all rooms. The typed lists are emptied in place so views held elsewhere stay valid
+        """
+        self._rooms.clear()
+        for rooms in self._by_type.values():
+            del rooms[:]
+
+    def __contains__(self, name):
+        return name in self._rooms
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __iter__(self):
+        for room in self.offices:
+            yield room
+        for room in self.living_spaces:
+            yield room
+
+
+class RoomPool(object):
+    """
+    Set of rooms with free space.
+    Rooms are kept in a list with a position index so membership changes and random picks are O(1)
+    """
+
+    def __init__(self, rooms=None, lock=NULL_LOCK):
+        """
+        :param rooms: (optional) initial rooms
+        :param lock: (optional) lock guarding the pool when it is shared across threads
+        """
+        self._rooms = []
+        self._positions = {}
+        self._lock = lock
+        for room in rooms or []:
+            self.add(room)
+
+    def add(self, room):
+        with self._lock:
+            if room in self._positions:
+                return
+            self._positions[room] = len(self._rooms)
+            self._rooms.append(room)
+
+    def discard(self, room):
+        """
+        remove room from the pool by swapping it with the last room
+        """
+        with self._lock:
+            position = self._positions.pop(room, None)
+            if position is None:
+                return
+            last = self._rooms.pop()
+            if last is not room:
+                self._rooms[position] = last
+                self._positions[last] = position
+
+    def update(self, room):
+        """
+        re-file room after its occupancy changed, it leaves the pool once full and re-joins when a seat frees up
+        """
+        if room.is_full():
+            self.discard(room)
+        else:
+            self.add(room)
+
+    def choice(self, rng=random):
+        """
+        pick a random room from the pool
+        :param rng: (optional) random number generator to use
+        :return: room or None if the pool is empty
+        """
+        with self._lock:
+            return rng.choice(self._rooms) if self._rooms else None
+
+    def last(self):
+        """
+        :return: the room added last, or None if the pool is empty
+        """
+        with self._lock:
+            return self._rooms[-1] if self._rooms else None
+
+    def clear(self):
+        with self._lock:
+            del self._rooms[:]
+            self._positions.clear()
+
+    def __contains__(self, room):
+        return room in self._positions
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._rooms))
+
+
+class BucketPool(object):
+    """
+    Set of rooms with free space, bucketed by their number of free seats.
+    There are at most as many buckets as seats in a room, so picking the emptiest room (least_loaded) or the
+    fullest room with a seat left (best_fit) is O(1) however many rooms there are. Rooms re-file themselves on
+    every occupancy change through update. Within a bucket the room filed last is picked, so picks are
+    reproducible: best_fit fills one room before starting the next and least_loaded goes round the emptiest rooms
+    """
+    ORDERS = ('least_loaded', 'best_fit')
+
+    def __init__(self, order, rooms=None, lock=NULL_LOCK):
+        """
+        :param order: 'least_loaded' or 'best_fit'
+        :param rooms: (optional) initial rooms
+        :param lock: (optional) lock guarding the pool when it is shared across threads
+        """
+        if order not in self.ORDERS:
+            raise ValueError("order should be one of {}".format(", ".join(self.ORDERS)))
+
+        self.order = order
+        # free seats to rooms with that many free seats, empty buckets are dropped
+        self._buckets = {}
+        self._free = {}
+        self._lock = lock
+        for room in rooms or []:
+            self.add(room)
+
+    def add(self, room):
+        """
+        file room under its current number of free seats, moving it if it was filed under another
+        """
+        free = room.capacity - len(room.occupants)
+        with self._lock:
+            filed = self._free.get(room)
+            if filed == free:
+                return
+            if filed is not None:
+                self._remove(room, filed)
+            if free > 0:
+                self._free[room] = free
+                if free not in self._buckets:
+                    self._buckets[free] = RoomPool()
+                self._buckets[free].add(room)
+
+    def discard(self, room):
+        with self._lock:
+            filed = self._free.get(room)
+            if filed is not None:
+                self._remove(room, filed)
+
+    def _remove(self, room, filed):
+        del self._free[room]
+        bucket = self._buckets[filed]
+        bucket.discard(room)
+        if not len(bucket):
+            del self._buckets[filed]
+
+    def update(self, room):
+        # full rooms have no free seats and are dropped by add
+        self.add(room)
+
+    def choice(self, rng=random):
+        """
+        pick the room the order prefers, rng is not used
+        :return: room or None if the pool is empty
+        """
+        with self._lock:
+            if not self._buckets:
+                return None
+            free = max(self._buckets) if self.order == 'least_loaded' else min(self._buckets)
+            return self._buckets[free].last()
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._free.clear()
+
+    def __contains__(self, room):
+        return room in self._free
+
+    def __len__(self):
+        return len(self._free)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._free))
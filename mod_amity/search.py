@@ -0,0 +1,83 @@
+GRAM_SIZE = 3
+
+
+def name_grams(name, size=GRAM_SIZE):
+    """
+    split name into overlapping n-grams
+    :param name: string to split
+    :param size: length of each gram
+    :return: set of grams, empty if name is shorter than size
+    """
+    return set(name[i:i + size] for i in range(len(name) - size + 1))
+
+
+class NameIndex(object):
+    """
+    Trigram inverted index over person names.
+    Answers partial name (substring) queries by intersecting the candidate sets of the query's trigrams,
+    then verifying each candidate, so results match a plain `query in person.name` scan.
+    Added people are indexed on the next search so bulk loads don't pay for the index until it is used
+    """
+
+    def __init__(self):
+        self._grams = {}
+        self._order = {}
+        self._pending = []
+
+    def add(self, person):
+        self._pending.append(person)
+
+    def flush(self):
+        """
+        index people added since the last search
+        """
+        for person in self._pending:
+            if person in self._order:
+                continue
+
+            self._order[person] = len(self._order)
+            for gram in name_grams(person.name):
+                self._grams.setdefault(gram, set()).add(person)
+
+        del self._pending[:]
+
+    def clear(self):
+        self._grams.clear()
+        self._order.clear()
+        del self._pending[:]
+
+    def search(self, query):
+        """
+        find persons whose name contains query.
+        Queries shorter than a trigram cannot use the index and fall back to checking every name
+        :param query: partial name, case sensitive
+        :return: list of matching persons in the order they were indexed
+        """
+        self.flush()
+        grams = name_grams(query)
+
+        if not grams:
+            candidates = self._order
+        else:
+            postings = []
+            for gram in grams:
+                posting = self._grams.get(gram)
+                if not posting:
+                    return []
+                postings.append(posting)
+
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+
+        matches = [person for person in candidates if query in person.name]
+        matches.sort(key=self._order.__getitem__)
+
+        return matches
+
+    def __len__(self):
+        self.flush()
+        return len(self._order)
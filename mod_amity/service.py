@@ -0,0 +1,169 @@
+"""
+Network service mode for amity, python 3.7+ only.
+
+Clients connect over TCP and send one JSON request per line, i.e
+    {"id": 1, "op": "add_person", "args": {"first_name": "Tana", "last_name": "Lopez", "role": "fellow"}}
+and get one JSON response per line with the same id
+    {"id": 1, "ok": true, "result": {...}} or {"id": 1, "ok": false, "error": "..."}
+"""
+import asyncio
+import json
+
+from mod_amity.util.report import person_json, room_json
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class AmityService(object):
+    """
+    Serves amity operations to many clients from one process.
+    Mutations are queued to a single writer task so they apply one at a time in arrival order, and are committed
+    to the journal, if one is open, before they are acknowledged. Reads run as soon as they arrive. Every amity call
+    runs to completion without yielding to the event loop, so reads always see a consistent state
+    """
+
+    def __init__(self, amity):
+        self.amity = amity
+        self.queue = None
+        self.writer = None
+        self.reads = {'print_room': self.print_room, 'print_unallocated': self.print_unallocated}
+        self.writes = {'create_room': self.create_room, 'add_person': self.add_person,
+                       'reallocate_person': self.reallocate_person}
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        start the writer and listen for clients
+        :param port: (optional) port to listen on, 0 picks a free port
+        :return: asyncio server
+        """
+        self.queue = asyncio.Queue()
+        self.writer = asyncio.ensure_future(self.write_loop())
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def stop(self, server):
+        server.close()
+        await server.wait_closed()
+        self.writer.cancel()
+        try:
+            await self.writer
+        except asyncio.CancelledError:
+            pass
+
+    async def write_loop(self):
+        while True:
+            operation, args, future = await self.queue.get()
+            try:
+                result = operation(args)
+                self.amity.commit()
+            except Exception as ex:
+                if not future.cancelled():
+                    future.set_exception(ex)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle(line)
+                writer.write(json.dumps(response).encode('utf-8') + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, line):
+        """
+        run one request
+        :param line: JSON encoded request
+        :return: response dict
+        """
+        request_id = None
+        try:
+            request = json.loads(line.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError("request should be a JSON object")
+            request_id = request.get('id')
+            op, args = request.get('op'), request.get('args') or {}
+
+            if op in self.reads:
+                result = self.reads[op](args)
+            elif op in self.writes:
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((self.writes[op], args, future))
+                result = await future
+            else:
+                raise ValueError("unknown op {}".format(op))
+        except Exception as ex:
+            return {'id': request_id, 'ok': False, 'error': str(ex)}
+
+        return {'id': request_id, 'ok': True, 'result': result}
+
+    def create_room(self, args):
+        room_type = args['type'].upper()
+        if room_type not in ["LIVING", "OFFICE"]:
+            raise ValueError("room type should be LIVING or OFFICE")
+
+        create = self.amity.create_living_space if room_type == "LIVING" else self.amity.create_office
+        names = args['names']
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise ValueError("names should be a list of room names")
+        # check every name first so a bad one does not leave the rooms before it created
+        if len(set(names)) != len(names):
+            raise ValueError("room names should be unique")
+        existing = [name for name in names if self.amity.rooms.get(name) is not None]
+        if existing:
+            raise ValueError("rooms already exist: {}".format(", ".join(existing)))
+
+        for name in names:
+            create(name)
+
+        return {'created': names}
+
+    def add_person(self, args):
+        role = args['role'].upper()
+        if role not in ["FELLOW", "STAFF"]:
+            raise ValueError("role should be STAFF or FELLOW")
+
+        accommodation = args.get('accommodation')
+        person = self.amity.add_person("{} {}".format(args['first_name'], args['last_name']), role,
+                                       accommodation.upper() if accommodation else None)
+        return person_json(person)
+
+    def reallocate_person(self, args):
+        return self.amity.relocate_person(args['person_id'].upper(), args['room'])
+
+    def print_room(self, args):
+        room = self.amity.get_rooms(args['room'])
+        if room is None:
+            raise ValueError("cannot find room named {}".format(args['room']))
+        return room_json(room)
+
+    def print_unallocated(self, args):
+        unallocated = self.amity.get_unallocated_persons()
+        return {'staff': [person_json(person) for person in unallocated['staff']],
+                'fellows': [person_json(person) for person in unallocated['fellows']]}
+
+
+def serve(amity, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    run the service until interrupted
+    """
+    async def main():
+        service = AmityService(amity)
+        server = await service.start(host, port)
+        print("Serving amity on {}:{}".format(host, server.sockets[0].getsockname()[1]))
+        try:
+            await server.serve_forever()
+        finally:
+            await service.stop(server)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,142 @@
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from mod_amity.models import Constants
+
+ROOM_KINDS = {Constants.OFFICE: 0, Constants.LIVING_SPACE: 1}
+
+NO_ROOM = -1
+
+
+class OccupancyStore(object):
+    """
+    Columnar store of room occupancy backed by numpy arrays.
+    Rooms and people get integer handles into the arrays so capacity queries across all rooms
+    i.e rooms with free space, total free seats, fullest rooms, are single vectorized operations.
+    Rooms keep their occupants list and update the store as occupants are added or removed
+    """
+
+    def __init__(self, size=1024):
+        if numpy is None:
+            raise ImportError("numpy is required for the columnar occupancy store")
+
+        self.rooms = []
+        self.people = []
+
+        self.capacity = numpy.zeros(size, dtype=numpy.int32)
+        self.count = numpy.zeros(size, dtype=numpy.int32)
+        self.kind = numpy.zeros(size, dtype=numpy.int8)
+
+        # room handle of each person's office and living space, NO_ROOM if not allocated
+        self.person_rooms = numpy.full((2, size), NO_ROOM, dtype=numpy.int32)
+
+    def add_room(self, room):
+        """
+        give room a handle and track its capacity and occupancy
+        :return: room handle
+        """
+        handle = len(self.rooms)
+        if handle == len(self.capacity):
+            self.capacity, self.count, self.kind = [self.grow(column) for column in
+                                                    (self.capacity, self.count, self.kind)]
+
+        self.rooms.append(room)
+        self.capacity[handle] = room.capacity
+        self.count[handle] = 0
+        self.kind[handle] = ROOM_KINDS[room.type]
+        room.store, room.handle = self, handle
+
+        for occupant in room.occupants:
+            self.occupy(room, occupant)
+
+        return handle
+
+    def add_person(self, person):
+        """
+        give person a handle
+        :return: person handle
+        """
+        handle = len(self.people)
+        if handle == self.person_rooms.shape[1]:
+            self.person_rooms = self.grow(self.person_rooms, NO_ROOM)
+
+        self.people.append(person)
+        person.handle = handle
+
+        return handle
+
+    @staticmethod
+    def grow(column, fill=0):
+        """
+        double the length of the last axis of column
+        """
+        extra = numpy.full(column.shape[:-1] + (column.shape[-1],), fill, dtype=column.dtype)
+        return numpy.concatenate([column, extra], axis=-1)
+
+    def occupy(self, room, person):
+        self.count[room.handle] += 1
+        if person.handle is not None:
+            self.person_rooms[self.kind[room.handle], person.handle] = room.handle
+
+    def vacate(self, room, person):
+        self.count[room.handle] -= 1
+        if person.handle is not None:
+            self.person_rooms[self.kind[room.handle], person.handle] = NO_ROOM
+
+    def clear(self):
+        del self.rooms[:]
+        del self.people[:]
+        self.count[:] = 0
+        self.person_rooms[:] = NO_ROOM
+
+    def room_mask(self, room_type=None):
+        size = len(self.rooms)
+        if room_type is None:
+            return numpy.ones(size, dtype=bool)
+        return self.kind[:size] == ROOM_KINDS[room_type]
+
+    def free_rooms(self, room_type=None):
+        """
+        :param room_type: (optional) Constants.OFFICE or Constants.LIVING_SPACE
+        :return: list of rooms with free space, in order of creation
+        """
+        size = len(self.rooms)
+        mask = self.room_mask(room_type) & (self.count[:size] < self.capacity[:size])
+        return [self.rooms[handle] for handle in numpy.flatnonzero(mask)]
+
+    def free_seats(self, room_type=None):
+        """
+        :param room_type: (optional) Constants.OFFICE or Constants.LIVING_SPACE
+        :return: total number of vacant spaces
+        """
+        size = len(self.rooms)
+        free = self.capacity[:size] - self.count[:size]
+        return int(free[self.room_mask(room_type)].sum())
+
+    def fullest_rooms(self, limit, room_type=None):
+        """
+        :param limit: number of rooms to return
+        :param room_type: (optional) Constants.OFFICE or Constants.LIVING_SPACE
+        :return: list of up to limit rooms with the highest share of occupied space, fullest first
+        """
+        handles = numpy.flatnonzero(self.room_mask(room_type))
+        if not len(handles) or limit <= 0:
+            return []
+
+        ratio = self.count[handles] / self.capacity[handles].astype(float)
+        # sorted over every room, not a partition of them, so rooms equally full at the cut-off are kept in order of
+        # creation as heapq.nlargest keeps them
+        top = numpy.lexsort((handles, -ratio))[:limit]
+
+        return [self.rooms[handle] for handle in handles[top]]
+
+    def unallocated_people(self, room_type):
+        """
+        :param room_type: Constants.OFFICE or Constants.LIVING_SPACE
+        :return: list of people without a room of room_type
+        """
+        size = len(self.people)
+        handles = numpy.flatnonzero(self.person_rooms[ROOM_KINDS[room_type], :size] == NO_ROOM)
+        return [self.people[handle] for handle in handles]
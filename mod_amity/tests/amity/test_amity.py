@@ -2,10 +2,22 @@ from __future__ import print_function
 
 import os
 import random
+import shutil
+import sys
+import tempfile
+import threading
 from unittest import TestCase
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from mod_amity.amity import Amity
+from mod_amity.models import Office
 from mod_amity.tests.amity import fake
+from mod_amity.util.db import DbUtil
+from mod_amity.util.journal import Journal
 
 
 class AmityTestCase(TestCase):
@@ -65,6 +77,23 @@ class AmityTestCase(TestCase):
 
         self.assertDictEqual({"fellows": [fellow], "staff": [staff]}, self.amity.get_unallocated_persons())
 
+    def test_unallocated_persons_track_allocation_changes(self):
+        fellow = self.amity.create_fellow(fake.first_name() + " " + fake.last_name(), accommodation='Y')
+        self.assertEqual([fellow], self.amity.get_unallocated_persons()["fellows"])
+
+        self.amity.create_office("Hogwarts")
+        self.amity.create_living_space("Shell")
+        self.amity.get_rooms("Hogwarts").allocate_space(fellow)
+        self.amity.check_person_allocation(fellow)
+        self.assertEqual([fellow], self.amity.get_unallocated_persons()["fellows"])
+
+        self.amity.get_rooms("Shell").allocate_space(fellow)
+        self.amity.check_person_allocation(fellow)
+        self.amity.check_person_allocation(fellow)
+
+        self.assertEqual([], self.amity.get_unallocated_persons()["fellows"])
+        self.assertEqual({fellow}, self.amity.allocated_fellows)
+
     def test_return_room_object_on_existing_room(self):
         office_name = "Krypton"
         living_space_name = "Peri"
@@ -117,6 +146,14 @@ class AmityTestCase(TestCase):
         self.assertIn(random_fellow, [person.name for person in self.amity.find_person_by_name(random_fellow)])
         self.assertEqual([], self.amity.find_person_by_name("Kimani Johns"))
 
+    def test_find_person_by_id(self):
+        staff = self.amity.create_staff(fake.first_name() + " " + fake.last_name())
+        fellow = self.amity.create_fellow(fake.first_name() + " " + fake.last_name())
+
+        self.assertIs(staff, self.amity.find_person_by_id(staff.id))
+        self.assertIs(fellow, self.amity.find_person_by_id(fellow.id))
+        self.assertIsNone(self.amity.find_person_by_id("FL999"))
+
     def test_relocate_fellow(self):
         office_names = ["Krypton", "Carmelot"]
         living_space_names = ["Peri", "Perl"]
@@ -161,8 +198,388 @@ class AmityTestCase(TestCase):
     def test_load_people(self):
         file_name = "sample.txt"
         file_path = os.path.dirname(os.path.realpath(__file__))+"/" + file_name
-        self.amity.load_people(file_path)
+        result = self.amity.load_people(file_path)
 
         self.assertEqual(3, len(self.amity.staff))
         self.assertEqual(4, len(self.amity.fellows))
+        self.assertEqual({'loaded': 7, 'errors': []}, result)
+
+    def test_load_people_streams_in_file_order(self):
+        file_path = os.path.dirname(os.path.realpath(__file__)) + "/sample.txt"
+        self.amity.create_office("Hogwarts")
+
+        people = list(self.amity.iter_load_people(file_path, chunk_size=2))
+
+        self.assertEqual([" Oluwafemi Sule", " Dominic Walters", " Simon Patterson", " Mari Lawrence",
+                          " Leigh Riley", " Tana Lopez", " Kelly Mcguire"], [person.name for person in people])
+        self.assertEqual(["FL001", "ST001", "FL002"], [person.id for person in people[:3]])
+        self.assertEqual(6, len([person for person in people if person.office == "Hogwarts"]))
+
+    def test_load_people_reports_malformed_lines(self):
+        file_path = os.path.dirname(os.path.realpath(__file__)) + "/malformed.txt"
+        result = self.amity.load_people(file_path)
+
+        self.assertEqual(2, result['loaded'])
+        self.assertEqual([2, 4, 5], [line_number for line_number, error in result['errors']])
+
+        with self.assertRaises(ValueError) as context:
+            list(Amity().iter_load_people(file_path))
+        self.assertIn("line 2", str(context.exception))
+
+    def test_full_rooms_leave_available_pool(self):
+        self.amity.create_living_space("Shell")
+        living_space = self.amity.get_rooms("Shell")
+
+        fellows = [self.amity.create_fellow(fake.first_name() + " " + fake.last_name(), accommodation='Y')
+                   for i in range(4)]
+
+        self.assertNotIn(living_space, self.amity.living_spaces["available"])
+        self.assertIsNone(self.amity.create_fellow(fake.first_name(), accommodation='Y').living_space)
+
+        self.amity.create_living_space("Perl")
+        self.amity.relocate_person(fellows[0].id, "Perl")
+
+        self.assertIn(living_space, self.amity.living_spaces["available"])
+
+    def test_allocate_batch(self):
+        for name in ["Krypton", "Carmelot"]:
+            self.amity.create_office(name)
+        self.amity.create_living_space("Shell")
+
+        people = [self.amity.create_fellow(fake.first_name() + " " + fake.last_name(), accommodation='Y',
+                                           allocate=False) for i in range(8)]
+        people += [self.amity.create_staff(fake.first_name() + " " + fake.last_name(), allocate=False)
+                   for i in range(6)]
+        self.amity.allocate_batch(people, seed=1)
+
+        self.assertEqual(12, len([person for person in people if person.office]))
+        self.assertEqual(4, len([person for person in people if person.role == "Fellow" and person.living_space]))
+        self.assertEqual(0, len(self.amity.offices["available"]))
+        self.assertEqual([person for person in people if person.role == "Staff" and not person.office],
+                         self.amity.get_unallocated_persons()["staff"])
+
+    def test_allocate_batch_is_reproducible_with_seed(self):
+        allocations = []
+        for i in range(2):
+            amity = Amity()
+            for name in ["Krypton", "Carmelot", "Valhalla"]:
+                amity.create_office(name)
+            people = [amity.create_staff("Staff {}".format(i), allocate=False) for i in range(10)]
+            amity.allocate_batch(people, seed=42)
+            allocations.append([person.office for person in people])
+
+        self.assertEqual(allocations[0], allocations[1])
+
+    def test_allocate_batch_sequential_fills_rooms_in_order(self):
+        for name in ["Krypton", "Carmelot"]:
+            self.amity.create_office(name)
+
+        people = [self.amity.create_staff("Staff {}".format(i), allocate=False) for i in range(7)]
+        self.amity.allocate_batch(people, strategy='sequential')
+
+        self.assertEqual(["Krypton"] * 6 + ["Carmelot"], [person.office for person in people])
+        self.assertRaises(ValueError, self.amity.allocate_batch, people, strategy='unknown')
+
+    def test_allocate_batch_reallocates_slots_taken_since_counted(self):
+        for name in ["Krypton", "Carmelot"]:
+            self.amity.create_office(name)
+        krypton = self.amity.get_rooms("Krypton")
+        people = [self.amity.create_staff("Staff {}".format(i), allocate=False) for i in range(7)]
+
+        # as if another thread filled Krypton after the batch counted its free seats
+        slots = self.amity.get_free_slots("Office", 7, 'sequential')
+        for i in range(6):
+            krypton.allocate_space(self.amity.create_staff("Staff", allocate=False))
+        with mock.patch.object(self.amity, 'get_free_slots', return_value=slots):
+            self.amity.allocate_batch(people, strategy='sequential')
+
+        self.assertEqual(["Carmelot"] * 6, [person.office for person in people[:6]])
+        self.assertIsNone(people[6].office)
+
+    def test_allocation_strategies(self):
+        for name in ["Krypton", "Carmelot", "Valhalla"]:
+            self.amity.create_office(name)
+
+        self.amity.set_strategy('least_loaded')
+        for i in range(6):
+            self.amity.add_person("Staff {}".format(i), "STAFF")
+        self.assertEqual([2, 2, 2], [len(room.occupants) for room in self.amity.rooms.offices])
+
+        self.amity.set_strategy('best_fit')
+        for i in range(5):
+            self.amity.add_person("Fellow {}".format(i), "FELLOW")
+        # one room is filled up before the next one gets anyone
+        self.assertEqual([2, 3, 6], sorted(len(room.occupants) for room in self.amity.rooms.offices))
+
+        self.assertRaises(ValueError, self.amity.set_strategy, 'first_come')
+
+    def test_random_strategy_is_reproducible_with_seed(self):
+        allocations = []
+        for i in range(2):
+            amity = Amity(seed=7)
+            for name in ["Krypton", "Carmelot", "Valhalla"]:
+                amity.create_office(name)
+            allocations.append([amity.add_person("Staff {}".format(i), "STAFF").office for i in range(10)])
+
+        self.assertEqual(allocations[0], allocations[1])
+
+    def test_allocate_batch_best_fit_fills_partly_occupied_rooms_first(self):
+        for name in ["Krypton", "Carmelot"]:
+            self.amity.create_office(name)
+        self.amity.allocate_person(self.amity.create_staff("Staff", allocate=False))
+        occupied = [room for room in self.amity.rooms.offices if room.occupants][0]
+
+        people = [self.amity.create_staff("Staff {}".format(i), allocate=False) for i in range(6)]
+        self.amity.allocate_batch(people, strategy='best_fit')
+
+        self.assertEqual([occupied.name] * 5, [person.office for person in people[:5]])
+        self.assertNotEqual(occupied.name, people[5].office)
+        self.assertEqual('random', self.amity.strategy)
+
+    def test_save_state_writes_only_changes_to_synced_db(self):
+        directory = tempfile.mkdtemp()
+        db_path = os.path.join(directory, "amity.sqlite")
+        self.addCleanup(shutil.rmtree, directory)
+
+        for office_name in ["Krypton", "Carmelot"]:
+            self.amity.create_office(office_name)
+        staff = [self.amity.create_staff("Staff {}".format(i)) for i in range(3)]
+        self.addCleanup(self.amity.close)
+        self.amity.save_state(db_path)
+        storage = self.amity.storage
 
+        self.assertEqual((set(), set()), (self.amity.dirty_rooms, self.amity.dirty_people))
+
+        new_office = "Carmelot" if staff[0].office == "Krypton" else "Krypton"
+        self.amity.relocate_person(staff[0].id, new_office)
+        self.amity.create_living_space("Shell")
+        self.assertEqual(({"Shell"}, {staff[0].id}), (self.amity.dirty_rooms, self.amity.dirty_people))
+
+        self.amity.save_state(db_path)
+        self.assertIs(storage, self.amity.storage)
+
+        amity = Amity()
+        self.addCleanup(amity.close)
+        amity.load_state(db_path)
+        self.assertEqual(new_office, amity.find_person_by_id(staff[0].id).office)
+        self.assertEqual(3, len(amity.staff))
+        self.assertEqual(["Shell"], [room.name for room in amity.get_rooms()["living_spaces"]])
+
+    def test_save_state_keeps_occupant_order_of_updated_people(self):
+        directory = tempfile.mkdtemp()
+        db_path = os.path.join(directory, "amity.sqlite")
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.amity.create_office("Krypton")
+        self.amity.create_living_space("Shell")
+        fellows = [self.amity.create_fellow("Fellow {}".format(i), "Y") for i in range(3)]
+        self.addCleanup(self.amity.close)
+        self.amity.save_state(db_path)
+
+        self.amity.create_living_space("Ruby")
+        self.amity.relocate_person(fellows[0].id, "Ruby")
+        self.amity.save_state(db_path)
+
+        amity = Amity()
+        self.addCleanup(amity.close)
+        amity.load_state(db_path)
+        self.assertEqual([fellow.id for fellow in fellows],
+                         [person.id for person in amity.get_rooms("Krypton").occupants])
+        self.assertEqual("Ruby", amity.find_person_by_id(fellows[0].id).living_space)
+
+    def test_load_state_restores_allocations_and_indexes(self):
+        directory = tempfile.mkdtemp()
+        db_path = os.path.join(directory, "amity.sqlite")
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.amity.create_office("Krypton")
+        self.amity.create_living_space("Shell")
+        fellows = [self.amity.create_fellow("Fellow {}".format(i), accommodation='Y') for i in range(5)]
+        staff = self.amity.create_staff("Kelly Mcguire")
+        self.amity.save_state(db_path)
+        self.amity.close()
+
+        for validate in [False, True]:
+            amity = Amity()
+            amity.load_state(db_path, validate=validate)
+            amity.close()
+
+            self.assertEqual([person.id for person in fellows[:5]] + [staff.id],
+                             [occupant.id for occupant in amity.get_rooms("Krypton").occupants])
+            self.assertEqual(4, len(amity.get_rooms("Shell").occupants))
+            self.assertEqual([], list(amity.living_spaces["available"]))
+            self.assertEqual([fellows[4].id], [person.id for person in amity.get_unallocated_persons()["fellows"]])
+            self.assertEqual([staff.id], [person.id for person in amity.find_person_by_name("Kelly")])
+            self.assertEqual("FL006", amity.create_fellow("Tana Lopez").id)
+
+    def test_load_state_stops_journaling_without_touching_snapshot(self):
+        directory = tempfile.mkdtemp()
+        db_path, backup_path = os.path.join(directory, "amity.sqlite"), os.path.join(directory, "backup.sqlite")
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(self.amity.close)
+
+        backup = Amity()
+        backup.create_office("Narnia")
+        backup.save_state(backup_path)
+        backup.close()
+
+        self.amity.recover(db_path)
+        self.amity.create_office("Krypton")
+        self.amity.compact()
+        self.amity.create_office("Carmelot")
+        self.amity.commit()
+
+        self.amity.load_state(backup_path)
+        self.assertIsNone(self.amity.journal)
+        self.assertEqual(["Narnia"], [room.name for room in self.amity.get_rooms()["offices"]])
+
+        amity = Amity()
+        self.addCleanup(amity.close)
+        self.assertEqual(1, amity.recover(db_path))
+        self.assertEqual(["Krypton", "Carmelot"], [room.name for room in amity.get_rooms()["offices"]])
+
+    def test_compact_syncs_snapshot_before_emptying_journal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(self.amity.close)
+        # recovering onto a database that does not exist yet, so compact rewrites the whole snapshot
+        self.amity.recover(os.path.join(directory, "amity.sqlite"))
+        self.amity.create_office("Krypton")
+
+        calls = mock.Mock()
+        with mock.patch.object(DbUtil, 'sync', calls.sync), mock.patch.object(Journal, 'truncate', calls.truncate):
+            self.amity.compact()
+
+        self.assertEqual([mock.call.sync(), mock.call.truncate()], calls.mock_calls)
+
+    def test_recover_replays_journal_on_snapshot(self):
+        directory = tempfile.mkdtemp()
+        db_path = os.path.join(directory, "amity.sqlite")
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(self.amity.close)
+
+        self.amity.recover(db_path)
+        self.amity.create_office("Krypton")
+        staff = self.amity.create_staff("Kelly Mcguire")
+        self.amity.commit()
+        self.amity.compact()
+
+        self.amity.create_office("Carmelot")
+        fellow = self.amity.create_fellow("Tana Lopez")
+        self.amity.relocate_person(staff.id, "Carmelot")
+        self.amity.commit()
+        # no save or close, as if the process crashed
+
+        amity = Amity()
+        self.addCleanup(amity.close)
+        self.assertEqual(3, amity.recover(db_path))
+        self.assertEqual(["Krypton", "Carmelot"], [room.name for room in amity.get_rooms()["offices"]])
+        self.assertEqual([occupant.id for occupant in self.amity.get_rooms("Carmelot").occupants],
+                         [occupant.id for occupant in amity.get_rooms("Carmelot").occupants])
+        self.assertEqual(fellow.office, amity.find_person_by_id(fellow.id).office)
+        self.assertEqual("ST002", amity.create_staff("Leigh Riley").id)
+
+        amity.compact()
+        self.assertEqual(0, os.path.getsize(db_path + ".journal"))
+        amity.close()
+
+        amity = Amity()
+        amity.load_state(db_path)
+        amity.close()
+        self.assertEqual(["Carmelot"], [amity.find_person_by_id(staff.id).office])
+        self.assertEqual(3, len(amity.people))
+
+    def test_thread_safe_allocations_never_exceed_capacity(self):
+        amity = Amity(thread_safe=True)
+        for i in range(20):
+            amity.create_office("Office {}".format(i))
+        for i in range(10):
+            amity.create_living_space("Living {}".format(i))
+        offices = [room.name for room in amity.get_rooms()["offices"]]
+
+        # switch threads as often as possible to shake out races
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for i in range(1000):
+                if i < 15:
+                    amity.create_fellow("Fellow {} {}".format(seed, i), accommodation='Y')
+                try:
+                    amity.relocate_person(rng.choice(list(amity.people)), rng.choice(offices))
+                except ValueError:
+                    pass
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(120, len(set(amity.people)))
+        for room in amity.rooms:
+            self.assertLessEqual(len(room.occupants), room.capacity)
+            self.assertEqual(not room.is_full(), room in room.pool)
+            for occupant in room.occupants:
+                self.assertEqual(room.name, occupant.office if room.type == "Office" else occupant.living_space)
+        for person in amity.people.values():
+            for room_name in [person.office, person.living_space]:
+                if room_name:
+                    self.assertIn(person.id, amity.get_rooms(room_name).occupants_by_id)
+        self.assertEqual(120, sum(len(room.occupants) for room in amity.get_rooms()["offices"]))
+        self.assertEqual(40, sum(len(room.occupants) for room in amity.get_rooms()["living_spaces"]))
+
+    def test_relocate_many_swaps_people_between_full_rooms(self):
+        self.amity.create_office("Krypton")
+        first = [self.amity.create_staff("Staff {}".format(i)) for i in range(6)]
+        self.amity.create_office("Carmelot")
+        second = [self.amity.create_staff("Staff {}".format(i)) for i in range(6, 12)]
+
+        self.assertRaises(ValueError, self.amity.relocate_person, first[0].id, "Carmelot")
+        relocations = self.amity.relocate_many([(first[0].id, "Carmelot"), (second[0].id, "Krypton")])
+
+        self.assertEqual([first[0].id, second[0].id], [relocation['person'] for relocation in relocations])
+        self.assertEqual("Carmelot", first[0].office)
+        self.assertEqual(set(person.id for person in second[1:] + first[:1]),
+                         set(self.amity.get_rooms("Carmelot").occupants_by_id))
+        self.assertEqual([], list(self.amity.offices["available"]))
+
+    def test_relocate_many_rejects_whole_plan(self):
+        self.amity.create_office("Krypton")
+        staff = [self.amity.create_staff("Staff {}".format(i)) for i in range(5)]
+        self.amity.create_office("Carmelot")
+        staff += [self.amity.create_staff("Staff {}".format(i)) for i in range(5, 8)]
+        offices = dict((person.id, person.office) for person in staff)
+
+        with self.assertRaises(ValueError) as context:
+            self.amity.relocate_many([(staff[0].id, "Carmelot"), ("ST999", "Krypton"), (staff[1].id, "Shell")])
+
+        self.assertIn("Cannot Find person with id ST999", str(context.exception))
+        self.assertIn("cannot find room named Shell", str(context.exception))
+        self.assertEqual(offices, dict((person.id, person.office) for person in staff))
+
+        with self.assertRaises(ValueError) as context:
+            self.amity.relocate_many([(person.id, "Krypton") for person in staff[5:]] + [(staff[0].id, "Carmelot")])
+        self.assertIn("Krypton would have 7 occupants, capacity is 6", str(context.exception))
+        self.assertEqual(offices, dict((person.id, person.office) for person in staff))
+
+    def test_relocate_many_rolls_back_on_error(self):
+        self.amity.create_office("Krypton")
+        staff = [self.amity.create_staff("Staff {}".format(i)) for i in range(2)]
+        self.amity.create_office("Carmelot")
+        add_occupant = Office.add_occupant
+        failures = [RuntimeError("disk full")]
+
+        def fail_on_second(room, person):
+            if person is staff[1] and failures:
+                raise failures.pop()
+            add_occupant(room, person)
+
+        with mock.patch.object(Office, 'add_occupant', fail_on_second):
+            self.assertRaises(RuntimeError, self.amity.relocate_many, [(person.id, "Carmelot") for person in staff])
+
+        self.assertEqual(["Krypton", "Krypton"], [person.office for person in staff])
+        self.assertEqual(set(person.id for person in staff), set(self.amity.get_rooms("Krypton").occupants_by_id))
+        self.assertEqual([], self.amity.get_rooms("Carmelot").occupants)
@@ -95,6 +95,17 @@ class OfficeClassTestCase(TestCase):
 
             self.assertIn("Room is full", exception)
 
+    def test_it_removes_occupant_by_id(self):
+        office = Office(self.office_name)
+        staff = Staff(name=fake.first_name() + " " + fake.last_name(), id="ST001")
+        fellow = Fellow(name=fake.first_name() + " " + fake.last_name(), id="FL001")
+        office.allocate_space(staff)
+        office.allocate_space(fellow)
+
+        self.assertIs(staff, office.remove_occupant("ST001"))
+        self.assertIsNone(office.remove_occupant("ST001"))
+        self.assertListEqual([fellow], office.occupants)
+
 
 class LivingSpaceTestCase(TestCase):
 
@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from mod_amity.models import Constants, Office, LivingSpace, Staff
+from mod_amity.registry import BucketPool, RoomRegistry, RoomPool
+
+
+class RoomRegistryTestCase(TestCase):
+    def setUp(self):
+        self.registry = RoomRegistry()
+
+    def test_it_gets_room_by_name(self):
+        office = self.registry.add(Office("Krypton"))
+        living_space = self.registry.add(LivingSpace("Peri"))
+
+        self.assertIs(office, self.registry.get("Krypton"))
+        self.assertIs(living_space, self.registry.get("Peri"))
+        self.assertIsNone(self.registry.get("Narnia"))
+
+    def test_it_filters_by_type(self):
+        self.registry.add(Office("Krypton"))
+        self.registry.add(LivingSpace("Peri"))
+
+        self.assertIsNone(self.registry.get("Krypton", Constants.LIVING_SPACE))
+        self.assertEqual("Peri", self.registry.get("Peri", Constants.LIVING_SPACE).name)
+        self.assertEqual(["Krypton"], [room.name for room in self.registry.of_type(Constants.OFFICE)])
+        self.assertEqual(["Peri"], [room.name for room in self.registry.living_spaces])
+
+    def test_raise_error_on_duplicate_name(self):
+        self.registry.add(Office("Krypton"))
+
+        with self.assertRaises(ValueError):
+            self.registry.add(LivingSpace("Krypton"))
+
+        self.assertEqual(1, len(self.registry))
+
+    def test_clear_keeps_typed_views(self):
+        offices = self.registry.offices
+        self.registry.add(Office("Krypton"))
+        self.registry.clear()
+
+        self.assertEqual([], offices)
+        self.assertNotIn("Krypton", self.registry)
+        self.registry.add(Office("Krypton"))
+        self.assertEqual(1, len(offices))
+
+
+class RoomPoolTestCase(TestCase):
+    def setUp(self):
+        self.rooms = [Office(name) for name in ["Krypton", "Carmelot", "Valhalla"]]
+        self.pool = RoomPool(self.rooms)
+
+    def test_it_removes_rooms(self):
+        self.pool.discard(self.rooms[0])
+        self.pool.discard(self.rooms[0])
+
+        self.assertEqual(2, len(self.pool))
+        self.assertNotIn(self.rooms[0], self.pool)
+        self.assertEqual(set(self.rooms[1:]), set(self.pool))
+
+    def test_it_picks_from_pool(self):
+        self.pool.discard(self.rooms[1])
+
+        self.assertIn(self.pool.choice(), [self.rooms[0], self.rooms[2]])
+        self.pool.clear()
+        self.assertIsNone(self.pool.choice())
+
+
+class BucketPoolTestCase(TestCase):
+    def setUp(self):
+        self.rooms = [Office("Krypton"), Office("Carmelot"), Office("Valhalla")]
+        for occupants, room in zip([1, 4, 6], self.rooms):
+            for i in range(occupants):
+                room.add_occupant(Staff("Staff {}".format(i), id="ST{}".format(i)))
+
+    def test_it_picks_by_free_seats(self):
+        self.assertIs(self.rooms[0], BucketPool('least_loaded', self.rooms).choice())
+        self.assertIs(self.rooms[1], BucketPool('best_fit', self.rooms).choice())
+        self.assertRaises(ValueError, BucketPool, 'first_come')
+
+    def test_update_refiles_rooms(self):
+        pool = BucketPool('best_fit', self.rooms)
+        self.assertEqual(2, len(pool))
+
+        self.rooms[1].remove_occupant("ST0")
+        self.rooms[1].remove_occupant("ST1")
+        pool.update(self.rooms[1])
+        self.rooms[2].remove_occupant("ST0")
+        pool.update(self.rooms[2])
+
+        self.assertEqual([self.rooms[2], self.rooms[0]], [pool.choice(), BucketPool('least_loaded', pool).choice()])
+        pool.discard(self.rooms[2])
+        self.assertIs(self.rooms[1], pool.choice())
+        pool.clear()
+        self.assertIsNone(pool.choice())
@@ -0,0 +1,100 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import run
+from mod_amity.amity import Amity
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+# modules only the commands using them should load
+DEFERRED = ('sqlalchemy', 'numpy', 'tabulate', 'clint', 'multiprocessing', 'csv')
+
+
+class StartupTestCase(TestCase):
+    def test_import_skips_heavy_dependencies(self):
+        # a fresh interpreter, this one has loaded everything the other tests use
+        output = subprocess.check_output([sys.executable, "-c", "import run, sys; print(' '.join(sys.modules))"],
+                                         cwd=ROOT, universal_newlines=True)
+        modules = output.split()
+
+        self.assertIn('mod_amity.amity', modules)
+        self.assertEqual([], [name for name in modules if name.split(".")[0] in DEFERRED])
+
+
+class ScriptTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.script = os.path.join(directory, "script.txt")
+        with open(self.script, 'w') as script:
+            script.write("# nightly moves\n"
+                         "create_room office Hogwarts Krypton\n"
+                         "\n"
+                         "add_person Tana Lopez fellow\n"
+                         "reallocate_person FL009 Krypton\n"
+                         "add_person Kelly Mcguire staff\n")
+
+        patcher = mock.patch.object(run, 'amity', Amity())
+        self.amity = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_script_runs_every_command(self):
+        summary = run.AmityRun().run_script(self.script)
+
+        self.assertEqual({'commands': 4, 'failed': 1}, summary)
+        self.assertEqual(["FL001", "ST001"], sorted(self.amity.people))
+
+    def test_script_stops_on_error(self):
+        summary = run.AmityRun().run_script(self.script, stop_on_error=True)
+
+        self.assertEqual({'commands': 3, 'failed': 1}, summary)
+        self.assertEqual(["FL001"], list(self.amity.people))
+
+    def test_script_reports_bad_numbers(self):
+        with open(self.script, 'w') as script:
+            script.write("load_people sample.txt --seed=abc\n"
+                         "strategy random --seed=abc\n")
+
+        summary = run.AmityRun().run_script(self.script)
+
+        self.assertEqual({'commands': 2, 'failed': 2}, summary)
+
+
+class DatabaseReportTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # paths given to the commands are relative to run.py
+        self.db_name = os.path.relpath(os.path.join(directory, "amity.sqlite"), ROOT)
+        self.report_name = os.path.relpath(os.path.join(directory, "unallocated.csv"), ROOT)
+
+        amity = Amity()
+        self.addCleanup(amity.close)
+        amity.create_office("Krypton")
+        amity.add_person("Tana Lopez", "FELLOW", "Y")
+        amity.add_person("Kelly Mcguire", "STAFF")
+        amity.save_state(os.path.join(directory, "amity.sqlite"))
+
+        patcher = mock.patch.object(run, 'amity', Amity())
+        self.amity = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.amity.close)
+
+    def test_print_unallocated_reads_database(self):
+        amity_run = run.AmityRun()
+        amity_run.onecmd("print_unallocated {} --format=csv --db={}".format(self.report_name, self.db_name))
+
+        with open(os.path.join(ROOT, self.report_name)) as report:
+            rows = [line.split(",")[:3] for line in report.read().splitlines()]
+        self.assertEqual(0, amity_run.errors)
+        self.assertEqual([["id", "name", "role"], ["FL001", "Tana Lopez", "Fellow"]], rows)
+        self.assertEqual({}, self.amity.people)
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from mod_amity.models import Staff, Fellow
+from mod_amity.search import NameIndex, name_grams
+from mod_amity.tests import fake
+
+
+class NameIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = NameIndex()
+        self.people = [Fellow(fake.first_name() + " " + fake.last_name()) for i in range(20)] + \
+                      [Staff(fake.first_name() + " " + fake.last_name()) for i in range(20)]
+        for person in self.people:
+            self.index.add(person)
+
+    def test_it_splits_name_into_grams(self):
+        self.assertEqual({"Ann", "nna"}, name_grams("Anna"))
+        self.assertEqual(set(), name_grams("An"))
+
+    def test_search_matches_substring_scan(self):
+        queries = [person.name[2:7] for person in self.people] + ["a", "an", "", " ", "Kimani Johns", "zzz"]
+
+        for query in queries:
+            expected = [person for person in self.people if query in person.name]
+            self.assertEqual(expected, self.index.search(query))
+
+    def test_search_is_case_sensitive(self):
+        index = NameIndex()
+        person = Staff("Brian Rotich")
+        index.add(person)
+
+        self.assertEqual([person], index.search("Rot"))
+        self.assertEqual([], index.search("rot"))
@@ -0,0 +1,32 @@
+"""
+Clients for the service tests. async def does not compile on python 2, so test_service imports this module only
+after checking the python version
+"""
+import asyncio
+import json
+
+
+def run_clients(service, *clients):
+    """
+    start the service on a free port and run clients, lists of requests, concurrently
+    :param service: AmityService instance
+    :return: list of responses of each client
+    """
+    async def client(port, requests):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = []
+        for request in requests:
+            writer.write(json.dumps(request).encode('utf-8') + b"\n")
+            responses.append(json.loads((await reader.readline()).decode('utf-8')))
+        writer.close()
+        return responses
+
+    async def main():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*[client(port, requests) for requests in clients])
+        finally:
+            await service.stop(server)
+
+    return asyncio.run(main())
@@ -0,0 +1,62 @@
+import sys
+from unittest import TestCase, SkipTest
+
+if sys.version_info < (3, 7):
+    raise SkipTest("service mode needs python 3.7+")
+
+from mod_amity.amity import Amity
+from mod_amity.service import AmityService
+from mod_amity.tests.service.service_clients import run_clients
+
+
+class AmityServiceTestCase(TestCase):
+    def setUp(self):
+        self.amity = Amity()
+        self.service = AmityService(self.amity)
+
+    def run_clients(self, *clients):
+        return run_clients(self.service, *clients)
+
+    def test_serves_mutations_and_reads(self):
+        responses, = self.run_clients([
+            {'id': 1, 'op': 'create_room', 'args': {'type': 'office', 'names': ['Krypton']}},
+            {'id': 2, 'op': 'add_person', 'args': {'first_name': 'Tana', 'last_name': 'Lopez', 'role': 'fellow'}},
+            {'id': 3, 'op': 'print_room', 'args': {'room': 'Krypton'}},
+            {'id': 4, 'op': 'print_unallocated'},
+            {'id': 5, 'op': 'reallocate_person', 'args': {'person_id': 'fl001', 'room': 'Shell'}},
+            {'id': 6, 'op': 'delete_room'},
+        ])
+
+        self.assertEqual([1, 2, 3, 4, 5, 6], [response['id'] for response in responses])
+        self.assertEqual([True] * 4 + [False] * 2, [response['ok'] for response in responses])
+        self.assertEqual("Krypton", responses[1]['result']['office'])
+        self.assertEqual(["FL001"], [person['id'] for person in responses[2]['result']['occupants']])
+        self.assertEqual(["FL001"], [person['id'] for person in responses[3]['result']['fellows']])
+        self.assertEqual("cannot find room named Shell", responses[4]['error'])
+
+    def test_concurrent_clients_share_one_state(self):
+        self.amity.create_office("Krypton")
+        clients = [[{'op': 'add_person', 'args': {'first_name': 'Staff', 'last_name': str(i), 'role': 'staff'}}
+                    for i in range(3)] for client in range(4)]
+
+        results = self.run_clients(*clients)
+
+        self.assertTrue(all(response['ok'] for responses in results for response in responses))
+        self.assertEqual(12, len(self.amity.staff))
+        self.assertEqual(12, len(set(self.amity.people)))
+        self.assertEqual(6, len(self.amity.get_rooms("Krypton").occupants))
+
+    def test_create_room_validates_names_before_creating(self):
+        self.amity.create_office("Krypton")
+
+        responses, = self.run_clients([
+            {'op': 'create_room', 'args': {'type': 'office', 'names': 'Hogwarts'}},
+            {'op': 'create_room', 'args': {'type': 'office', 'names': ['Hogwarts', 7]}},
+            {'op': 'create_room', 'args': {'type': 'office', 'names': ['Hogwarts', 'Hogwarts']}},
+            {'op': 'create_room', 'args': {'type': 'office', 'names': ['Hogwarts', 'Krypton']}},
+        ])
+
+        self.assertEqual(["names should be a list of room names", "names should be a list of room names",
+                          "room names should be unique", "rooms already exist: Krypton"],
+                         [response['error'] for response in responses])
+        self.assertEqual(["Krypton"], [room.name for room in self.amity.rooms.offices])
@@ -0,0 +1,59 @@
+from unittest import TestCase, skipIf
+
+from mod_amity.amity import Amity
+from mod_amity.models import Constants
+from mod_amity.store import numpy
+
+
+@skipIf(numpy is None, "numpy not installed")
+class OccupancyStoreTestCase(TestCase):
+    def setUp(self):
+        self.amities = [Amity(), Amity(columnar=True)]
+        for amity in self.amities:
+            for i in range(3):
+                amity.create_office("office-{}".format(i))
+                amity.create_living_space("living-{}".format(i))
+            people = [amity.create_fellow("Fellow {}".format(i), accommodation='Y', allocate=False)
+                      for i in range(9)]
+            amity.allocate_batch(people, strategy='sequential')
+        self.amity, self.columnar = self.amities
+
+    def test_store_tracks_occupancy(self):
+        store = self.columnar.store
+
+        self.assertEqual([6, 4, 3, 4, 0, 1], list(store.count[:6]))
+        self.assertEqual([person.id for person in self.columnar.fellows],
+                         [store.people[handle].id for handle in range(9)])
+        self.assertEqual([], store.unallocated_people(Constants.OFFICE))
+
+    def test_capacity_queries_match_python_backend(self):
+        for room_type in [Constants.OFFICE, Constants.LIVING_SPACE]:
+            self.assertEqual([room.name for room in self.amity.get_free_rooms(room_type)],
+                             [room.name for room in self.columnar.get_free_rooms(room_type)])
+            self.assertEqual(self.amity.count_free_seats(room_type), self.columnar.count_free_seats(room_type))
+            self.assertEqual([room.name for room in self.amity.get_fullest_rooms(2, room_type)],
+                             [room.name for room in self.columnar.get_fullest_rooms(2, room_type)])
+
+        self.assertEqual(12, self.columnar.count_free_seats())
+
+    def test_relocation_updates_store(self):
+        fellow = self.columnar.fellows[0]
+        self.columnar.relocate_person(fellow.id, "office-2")
+
+        office = self.columnar.get_rooms("office-2")
+
+        self.assertEqual([5, 3, 1], [self.columnar.store.count[room.handle] for room in self.columnar.offices["total"]])
+        self.assertEqual(office.handle, self.columnar.store.person_rooms[0, fellow.handle])
+        self.assertEqual(["office-0", "office-1", "office-2"],
+                         [room.name for room in self.columnar.get_fullest_rooms(3, Constants.OFFICE)])
+
+    def test_fullest_rooms_keep_creation_order_for_ties(self):
+        amities = [Amity(seed=3), Amity(seed=3, columnar=True)]
+        for amity in amities:
+            for i in range(20):
+                amity.create_office("o{}".format(i))
+            for i in range(25):
+                amity.create_staff("Staff {}".format(i))
+
+        python, columnar = [[room.name for room in amity.get_fullest_rooms(8, Constants.OFFICE)] for amity in amities]
+        self.assertEqual(python, columnar)
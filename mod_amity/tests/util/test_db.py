@@ -0,0 +1,117 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from mod_amity.amity import Amity
+from mod_amity.models import Office, LivingSpace, Fellow, Staff
+from mod_amity.util.db import DbUtil, batches
+
+
+class DbUtilTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.office, self.living_space = Office("Hogwarts"), LivingSpace("Shell")
+        self.fellow = Fellow("Tana Lopez", accommodation='Y', id="FL001")
+        self.staff = Staff("Leigh Riley", id="ST001")
+        self.office.allocate_space(self.fellow)
+        self.office.allocate_space(self.staff)
+        self.living_space.allocate_space(self.fellow)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save_and_load(self, **kwargs):
+        db_path = os.path.join(self.directory, "amity.sqlite")
+        with DbUtil(db_path) as db_util:
+            db_util.save_to_db(rooms=[self.office, self.living_space],
+                               people={'fellows': [self.fellow], 'staff': [self.staff]}, **kwargs)
+        with DbUtil(db_path) as db_util:
+            rows = db_util.load_rows()
+        amity = Amity()
+        amity.hydrate(rows)
+        return amity
+
+    def assert_loaded(self, amity):
+        offices, living_spaces = amity.rooms.offices, amity.rooms.living_spaces
+
+        self.assertEqual(["Hogwarts"], [office.name for office in offices])
+        self.assertEqual(["FL001", "ST001"], [occupant.id for occupant in offices[0].occupants])
+        self.assertEqual(["FL001"], [occupant.id for occupant in living_spaces[0].occupants])
+        self.assertEqual("Shell", amity.fellows[0].living_space)
+
+    def test_bulk_save(self):
+        self.assert_loaded(self.save_and_load(batch_size=1))
+
+    def test_orm_save(self):
+        self.assert_loaded(self.save_and_load(bulk=False))
+
+    def test_it_reuses_connection_until_closed(self):
+        with DbUtil(os.path.join(self.directory, "amity.sqlite")) as db_util:
+            connection = db_util.connection
+            db_util.save_to_db(rooms=[self.office], people={'fellows': [], 'staff': []})
+            db_util.clear()
+            db_util.save_to_db(rooms=[self.living_space], people={'fellows': [], 'staff': []})
+
+            self.assertIs(connection, db_util.connection)
+            self.assertEqual([("Shell", "Living Space")], db_util.load_rows()['rooms'])
+
+        self.assertIsNone(db_util.connection)
+
+    def test_replace_keeps_saved_state_when_save_fails(self):
+        db_path = os.path.join(self.directory, "amity.sqlite")
+        with DbUtil(db_path) as db_util:
+            self.assertTrue(db_util.fresh)
+            db_util.save_to_db(rooms=[self.office], people={'fellows': [], 'staff': []})
+            self.assertFalse(db_util.fresh)
+
+        with DbUtil(db_path) as db_util:
+            # only a file just created is written without syncing
+            self.assertFalse(db_util.fresh)
+            with self.assertRaises(Exception):
+                db_util.save_to_db(rooms=[self.living_space], people={'fellows': [self.fellow, self.fellow],
+                                                                      'staff': []}, replace=True)
+
+            self.assertEqual([("Hogwarts", "Office")], db_util.load_rows()['rooms'])
+
+    def test_it_queries_rooms_and_unallocated_people(self):
+        fellow = Fellow("Mari Lawrence", id="FL002")
+        with DbUtil(os.path.join(self.directory, "amity.sqlite")) as db_util:
+            db_util.save_to_db(rooms=[self.office, self.living_space],
+                               people={'fellows': [self.fellow, fellow], 'staff': [self.staff]})
+
+            self.assertEqual({'name': "Shell", 'type': "Living Space",
+                              'occupants': [("FL001", "Tana Lopez", "Fellow")]}, db_util.get_room("Shell"))
+            self.assertIsNone(db_util.get_room("Narnia"))
+            self.assertEqual([("FL002", "Mari Lawrence", "Fellow", "N", None, None)], db_util.get_unallocated())
+            self.assertEqual([], db_util.get_unallocated("Staff"))
+            self.assertEqual(["FL002"], [row[0] for row in db_util.get_unallocated("Fellow", "Office")])
+            self.assertEqual([], db_util.get_unallocated(room_type="Living Space"))
+
+    def test_it_migrates_original_schema(self):
+        db_path = os.path.join(self.directory, "legacy.sqlite")
+        connection = sqlite3.connect(db_path)
+        connection.executescript("""
+            CREATE TABLE rooms (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, type VARCHAR);
+            CREATE TABLE fellows (id INTEGER PRIMARY KEY, fellow_id VARCHAR, fellow_name VARCHAR,
+                                  fellow_office VARCHAR, fellow_living_space VARCHAR,
+                                  fellow_need_accommodation VARCHAR);
+            CREATE TABLE staff (id INTEGER PRIMARY KEY, staff_id VARCHAR UNIQUE, staff_name VARCHAR,
+                                staff_office VARCHAR);
+            INSERT INTO rooms (name, type) VALUES ('Hogwarts', 'Office'), ('Shell', 'Living Space');
+            INSERT INTO fellows (fellow_id, fellow_name, fellow_office, fellow_living_space, fellow_need_accommodation)
+                VALUES ('FL001', 'Tana Lopez', 'Hogwarts', 'Shell', 'Y');
+            INSERT INTO staff (staff_id, staff_name, staff_office) VALUES ('ST001', 'Leigh Riley', NULL);
+        """)
+        connection.commit()
+        connection.close()
+
+        with DbUtil(db_path) as db_util:
+            rows = db_util.load_rows()
+
+        self.assertEqual([("FL001", "Tana Lopez", "Hogwarts", "Shell", "Y")], rows['fellows'])
+        self.assertEqual([("ST001", "Leigh Riley", None)], rows['staff'])
+
+    def test_it_splits_batches(self):
+        self.assertEqual([[0, 1], [2, 3], [4]], list(batches(range(5), 2)))
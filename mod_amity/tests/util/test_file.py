@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from mod_amity.util.file import FileUtil
+
+SAMPLE = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + "/amity/sample.txt"
+MALFORMED = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + "/amity/malformed.txt"
+
+
+class FileUtilTestCase(TestCase):
+    def test_it_reads_lines_in_file_order(self):
+        lines = list(FileUtil.read_lines(MALFORMED))
+
+        self.assertEqual([1, 2, 4, 5, 6], [line_number for line_number, fields in lines])
+        self.assertEqual(["Oluwafemi", "Sule", "Fellow", "Y"], lines[0][1])
+
+    def test_it_parses_person(self):
+        self.assertEqual((" Tana Lopez", "FELLOW", "Y"), FileUtil.parse_person(["Tana", "Lopez", "fellow", "y"]))
+        self.assertEqual((" Leigh Riley", "STAFF", None), FileUtil.parse_person(["Leigh", "Riley", "Staff"]))
+        self.assertRaises(ValueError, FileUtil.parse_person, ["Leigh", "Riley"])
+        self.assertRaises(ValueError, FileUtil.parse_person, ["Leigh", "Riley", "Manager"])
+        self.assertRaises(ValueError, FileUtil.parse_person, ["Leigh", "Riley", "Fellow", "Maybe"])
+
+    def test_split_file_ranges_start_at_lines(self):
+        ranges = FileUtil.split_file(SAMPLE, 3, range_size=16)
+        size = os.path.getsize(SAMPLE)
+
+        with open(SAMPLE, 'rb') as file_handle:
+            data = file_handle.read()
+
+        self.assertEqual(0, ranges[0][0])
+        self.assertEqual(size, ranges[-1][1])
+        for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(b"\n", data[next_start - 1:next_start])
+
+    def test_parallel_parse_matches_serial_parse(self):
+        for file_name in [SAMPLE, MALFORMED]:
+            self.assertEqual(list(FileUtil.parse_file(file_name)),
+                             list(FileUtil.parse_file_parallel(file_name, 2, range_size=16)))
+
+    def test_parallel_parse_bounds_ranges_in_flight(self):
+        counts = {'in_flight': 0, 'most': 0}
+
+        class Result(object):
+            def __init__(self, func, args):
+                self.func, self.args = func, args
+                counts['in_flight'] += 1
+                counts['most'] = max(counts['most'], counts['in_flight'])
+
+            def get(self):
+                counts['in_flight'] -= 1
+                return self.func(*self.args)
+
+        # parses ranges in process, only when they are read
+        pool = mock.Mock(apply_async=Result)
+
+        with mock.patch('multiprocessing.Pool', return_value=pool):
+            entries = list(FileUtil.parse_file_parallel(SAMPLE, 2, range_size=16))
+
+        self.assertEqual(list(FileUtil.parse_file(SAMPLE)), entries)
+        self.assertLess(2, len(FileUtil.split_file(SAMPLE, 2, range_size=16)))
+        self.assertEqual(2, counts['most'])
+
+    def test_it_reads_relocation_plan(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        plan = os.path.join(directory, "plan.txt")
+
+        FileUtil.write_to_file(plan, ["fl001 Valhalla", "# swap back", "ST001 Carmelot"])
+        self.assertEqual([("FL001", "Valhalla"), ("ST001", "Carmelot")], FileUtil.read_plan(plan))
+
+        FileUtil.write_to_file(plan, ["FL001 Valhalla", "ST001"])
+        self.assertRaises(ValueError, FileUtil.read_plan, plan)
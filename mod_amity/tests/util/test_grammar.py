@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from docopt import docopt, DocoptExit
+
+from mod_amity.util.grammar import Grammar
+
+USAGE = """
+    Usage: create_room (living|office) <room_names>... [--capacity=<count>] [--db=sqlite_database]
+"""
+
+
+class GrammarTestCase(TestCase):
+    def test_parse_matches_docopt(self):
+        grammar = Grammar(USAGE)
+        # twice, the second time from the kept shapes
+        for argv in ["office Hogwarts", "living Shell Krypton --capacity=4", "office office", "office",
+                     "office Hogwarts --db=amity.sqlite", "theatre Hogwarts"] * 2:
+            try:
+                expected = docopt(USAGE, argv)
+            except DocoptExit:
+                self.assertRaises(DocoptExit, grammar.parse, argv)
+            else:
+                self.assertEqual(expected, grammar.parse(argv))
+
+    def test_repeated_arguments_are_not_shared(self):
+        grammar = Grammar("Usage: print_unallocated [<file_names>...]")
+
+        grammar.parse("")['<file_names>'].append("unallocated.txt")
+
+        self.assertEqual([], grammar.parse("")['<file_names>'])
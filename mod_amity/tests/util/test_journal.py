@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mod_amity.util.journal import Journal
+
+
+class JournalTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "amity.sqlite.journal")
+
+    def test_commit_folds_records_of_same_key(self):
+        journal = Journal(self.path)
+        journal.append(('person', 'FL001'), {'op': 'person', 'office': None})
+        journal.append(('room', 'Krypton'), {'op': 'room'})
+        journal.append(('person', 'FL001'), {'op': 'person', 'office': 'Krypton'})
+
+        self.assertEqual(0, len(list(Journal.read(self.path))))
+        self.assertEqual(2, journal.commit())
+        journal.close()
+
+        self.assertEqual([{'op': 'room'}, {'op': 'person', 'office': 'Krypton'}], list(Journal.read(self.path)))
+
+    def test_interrupted_write_is_ignored_and_trimmed(self):
+        with open(self.path, 'wb') as file_handle:
+            file_handle.write(b'{"op":"room"}\n{"op":"per')
+
+        self.assertEqual([{'op': 'room'}], list(Journal.read(self.path)))
+
+        journal = Journal(self.path)
+        journal.append(('room', 'Shell'), {'op': 'room', 'name': 'Shell'})
+        journal.close()
+
+        self.assertEqual([{'op': 'room'}, {'op': 'room', 'name': 'Shell'}], list(Journal.read(self.path)))
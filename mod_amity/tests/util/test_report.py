@@ -0,0 +1,65 @@
+import io
+import json
+from unittest import TestCase
+
+from mod_amity.amity import Amity
+from mod_amity.models import Constants
+from mod_amity.util.report import write_allocations, write_unallocated
+
+
+class ReportTestCase(TestCase):
+    def setUp(self):
+        self.amity = Amity()
+        self.amity.create_office("Krypton")
+        self.amity.create_living_space("Shell")
+        self.amity.create_office("Carmelot")
+        self.staff = self.amity.create_staff("Leigh Riley")
+        self.fellow = self.amity.create_fellow("Tana Lopez", accommodation='Y')
+        self.amity.relocate_person(self.staff.id, "Krypton")
+        self.amity.relocate_person(self.fellow.id, "Krypton")
+        self.sections = [("Offices", self.amity.rooms.offices), ("Living Spaces", self.amity.rooms.living_spaces)]
+
+    def test_it_writes_text_allocations(self):
+        out = io.StringIO()
+
+        self.assertEqual(3, write_allocations(out, self.sections))
+
+        lines = out.getvalue().split("\n")
+        self.assertEqual(["Offices", "    Krypton"], lines[:2])
+        self.assertIn("        | ST001 | Leigh Riley | Staff  |", lines)
+        self.assertIn("    Carmelot", lines)
+        self.assertIn("Living Spaces", lines)
+
+    def test_it_writes_csv_and_jsonl_allocations(self):
+        out = io.StringIO()
+        write_allocations(out, self.sections[:1], 'csv')
+
+        self.assertEqual(["room,type,id,name,role", "Krypton,Office,ST001,Leigh Riley,Staff",
+                          "Krypton,Office,FL001,Tana Lopez,Fellow", "Carmelot,Office,,,"],
+                         out.getvalue().splitlines())
+
+        out = io.StringIO()
+        write_allocations(out, self.sections, 'jsonl')
+        rooms = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        self.assertEqual(["Krypton", "Carmelot", "Shell"], [room['name'] for room in rooms])
+        self.assertEqual(["ST001", "FL001"], [person['id'] for person in rooms[0]['occupants']])
+        self.assertRaises(ValueError, write_allocations, out, self.sections, 'xml')
+
+    def test_it_writes_unallocated_by_room_type(self):
+        self.amity.create_fellow("Mari Lawrence", accommodation='Y', allocate=False)
+        out = io.StringIO()
+
+        count = write_unallocated(out, [("Staff", self.amity.iter_unallocated(Constants.STAFF)),
+                                        ("Fellows", self.amity.iter_unallocated(Constants.FELLOW))])
+
+        self.assertEqual(1, count)
+        self.assertIn("        All Staff Allocated", out.getvalue())
+        self.assertIn("Mari Lawrence", out.getvalue())
+
+        out = io.StringIO()
+        write_unallocated(out, [("Fellows", self.amity.iter_unallocated(Constants.FELLOW, Constants.LIVING_SPACE))],
+                          'csv')
+
+        self.assertEqual(["id,name,role,office,living_space", "FL002,Mari Lawrence,Fellow,,"],
+                         out.getvalue().splitlines())
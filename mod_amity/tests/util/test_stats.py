@@ -0,0 +1,59 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mod_amity.amity import Amity
+from mod_amity.util.stats import OperationStats, Stats, SAMPLE_SIZE
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        self.amity = Amity()
+
+    def test_enabled_stats_count_and_time_operations(self):
+        stats = self.amity.enable_stats()
+        self.amity.create_office("Hogwarts")
+        for i in range(3):
+            self.amity.add_person("Person {}".format(i), "STAFF")
+        add_person = stats.to_dict()['operations']['add_person']
+        file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "amity", "sample.txt")
+        people = list(self.amity.iter_load_people(file_path))
+
+        data = stats.to_dict()
+        self.assertEqual(1, data['operations']['create_office']['count'])
+        self.assertEqual(3, add_person['count'])
+        self.assertEqual(1, data['operations']['iter_load_people']['count'])
+        self.assertEqual(7, len(people))
+        self.assertTrue(add_person['p50'] <= add_person['p99'] <= add_person['max'])
+        self.assertTrue(data['room_scans']['get_free_slots'] >= 1)
+
+    def test_disabled_stats_remove_wrappers(self):
+        self.amity.enable_stats()
+        self.amity.disable_stats()
+        self.amity.create_office("Hogwarts")
+
+        self.assertIsNone(self.amity.stats)
+        self.assertNotIn('create_office', vars(self.amity))
+
+    def test_samples_stay_bounded(self):
+        operation = OperationStats(Stats().rng)
+        for i in range(SAMPLE_SIZE * 4):
+            operation.add(float(i))
+
+        self.assertEqual(SAMPLE_SIZE, len(operation.samples))
+        self.assertEqual(SAMPLE_SIZE * 4, operation.count)
+        self.assertEqual(SAMPLE_SIZE * 4 - 1, operation.max)
+
+    def test_dump_writes_json(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        stats = self.amity.enable_stats()
+        self.amity.create_living_space("Shell")
+        file_name = os.path.join(directory, "stats.json")
+
+        stats.dump(file_name)
+
+        with open(file_name) as stats_file:
+            self.assertEqual(1, json.load(stats_file)['operations']['create_living_space']['count'])
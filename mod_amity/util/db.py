@@ -1,14 +1,40 @@
 from __future__ import print_function, unicode_literals
 
-from sqlalchemy import Column, String, Integer
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import Column, String, Integer, ForeignKey, MetaData, Table
+from sqlalchemy import bindparam, create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session
 
-from mod_amity.models import Constants, LivingSpace, Office, Staff, Fellow
+from mod_amity.models import Constants
 
 Base = declarative_base()
 
+# rows per executemany call when bulk saving
+BATCH_SIZE = 10000
+
+# ids per IN (...) clause, kept below sqlite's bound parameter limit
+DELETE_BATCH_SIZE = 500
+
+# sqlite settings for a bulk load into a database file just created, a crash can only lose that file.
+# Restored once the load is done
+BULK_PRAGMAS = (('journal_mode', 'MEMORY'), ('synchronous', 'OFF'))
+
+
+def batches(rows, batch_size):
+    """
+    split an iterable of rows into lists of at most batch_size rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
 class RoomDB(Base):
     __tablename__ = 'rooms'
@@ -22,121 +48,362 @@ class RoomDB(Base):
         self.type = room_type
 
 
-class FellowDB(Base):
-    __tablename__ = 'fellows'
-    id = Column(Integer, primary_key=True)
-    fellow_id = Column(String)
-    fellow_name = Column(String)
-    fellow_office = Column(String)
-    fellow_living_space = Column(String)
-    fellow_need_accommodation = Column(String)
-
-    def __init__(self, fellow_id, name, office, living_space, need_accommodation):
-        self.fellow_id = fellow_id
-        self.fellow_name = name
-        self.fellow_office = office
-        self.fellow_living_space = living_space
-        self.fellow_need_accommodation = need_accommodation
-
-
-class StaffDB(Base):
-    __tablename__ = 'staff'
-    id = Column(Integer, primary_key=True)
-    staff_id = Column(String, unique=True)
-    staff_name = Column(String)
-    staff_office = Column(String)
+class PersonDB(Base):
+    __tablename__ = 'people'
 
-    def __init__(self, staff_id, name, office):
-        self.staff_id = staff_id
-        self.staff_name = name
-        self.staff_office = office
+    id = Column(Integer, primary_key=True)
+    person_id = Column(String, unique=True, index=True)
+    name = Column(String)
+    role = Column(String, index=True)
+    accommodation = Column(String)
+    office_id = Column(Integer, ForeignKey('rooms.id'), index=True)
+    living_space_id = Column(Integer, ForeignKey('rooms.id'), index=True)
+
+    def __init__(self, person_id, name, role, accommodation=None, office_id=None, living_space_id=None):
+        self.person_id = person_id
+        self.name = name
+        self.role = role
+        self.accommodation = accommodation
+        self.office_id = office_id
+        self.living_space_id = living_space_id
+
+
+# tables of the original schema, room assignments stored as room names. Only read when migrating
+legacy_metadata = MetaData()
+
+legacy_fellows = Table('fellows', legacy_metadata,
+                       Column('id', Integer, primary_key=True),
+                       Column('fellow_id', String),
+                       Column('fellow_name', String),
+                       Column('fellow_office', String),
+                       Column('fellow_living_space', String),
+                       Column('fellow_need_accommodation', String))
+
+legacy_staff = Table('staff', legacy_metadata,
+                     Column('id', Integer, primary_key=True),
+                     Column('staff_id', String, unique=True),
+                     Column('staff_name', String),
+                     Column('staff_office', String))
+
+MIGRATE_LEGACY = [
+    "INSERT OR REPLACE INTO people (person_id, name, role, accommodation, office_id, living_space_id) "
+    "SELECT f.fellow_id, f.fellow_name, 'Fellow', f.fellow_need_accommodation, o.id, l.id FROM fellows f "
+    "LEFT JOIN rooms o ON o.name = f.fellow_office AND o.type = 'Office' "
+    "LEFT JOIN rooms l ON l.name = f.fellow_living_space AND l.type = 'Living Space' ORDER BY f.id",
+    "INSERT OR REPLACE INTO people (person_id, name, role, accommodation, office_id, living_space_id) "
+    "SELECT s.staff_id, s.staff_name, 'Staff', NULL, o.id, NULL FROM staff s "
+    "LEFT JOIN rooms o ON o.name = s.staff_office AND o.type = 'Office' ORDER BY s.id",
+    "DROP TABLE fellows",
+    "DROP TABLE staff",
+]
+
+SELECT_PEOPLE = ("SELECT p.person_id, p.name, p.role, p.accommodation, o.name, l.name FROM people p "
+                 "LEFT JOIN rooms o ON o.id = p.office_id LEFT JOIN rooms l ON l.id = p.living_space_id")
 
 
 class DbUtil(object):
+    """
+    Storage handle for one sqlite database.
+    The engine, schema and connection are set up once and reused by every operation until close(),
+    it can also be used as a context manager
+    """
+
     def __init__(self, db_path):
 
-        engine = create_engine('sqlite:///{}'.format(db_path))
-        Base.metadata.create_all(engine)
-        self.db = Session(bind=engine)
+        self.db_path = db_path
+        # True until the first write to a file this handle created, nothing in it can be lost until then
+        self.fresh = not os.path.exists(db_path)
+        self.engine = create_engine('sqlite:///{}'.format(db_path))
+        Base.metadata.create_all(self.engine)
+        self.connection = self.engine.connect()
+        self._session = None
+        self.migrate()
+
+    @property
+    def db(self):
+        """
+        ORM session, only created for the ORM code paths
+        """
+        if self._session is None:
+            self._session = Session(bind=self.engine)
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            self.engine.dispose()
+
+    def sync(self):
+        """
+        force committed writes to disk, including those made with synchronous=OFF
+        """
+        file_handle = os.open(self.db_path, os.O_RDONLY)
+        try:
+            os.fsync(file_handle)
+        finally:
+            os.close(file_handle)
+
+        # a newly created file is only durable once its directory entry is
+        if os.name == 'posix':
+            directory = os.open(os.path.dirname(self.db_path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def migrate(self):
+        """
+        move people from the original fellows and staff tables into the people table
+        :return: True if the database was migrated
+        """
+        tables = inspect(self.engine).get_table_names()
+        if legacy_fellows.name not in tables or legacy_staff.name not in tables:
+            return False
+
+        with self.connection.begin():
+            for statement in MIGRATE_LEGACY:
+                self.connection.execute(text(statement))
+
+        return True
 
-    def save_to_db(self, rooms, people):
+    def save_to_db(self, rooms, people, bulk=True, batch_size=BATCH_SIZE, replace=False):
         """
-        write staff, fellows, staff to database
+        write rooms, fellows, staff to database
+        :param bulk: (optional) use the bulk insert path, otherwise add one ORM object per row
+        :param batch_size: (optional) rows per insert statement for the bulk path
+        :param replace: (optional) delete the saved rooms and people first, in the same transaction
         """
+        if bulk:
+            return self.bulk_save_to_db(rooms, people, batch_size, replace)
 
-        for room in rooms:
-            self.db.add(RoomDB(room.name, room.type), _warn=False)
+        return self.orm_save_to_db(rooms, people, replace)
 
-        for fellow in people['fellows']:
-            self.db.add(
-                FellowDB(fellow_id=fellow.id, name=fellow.name, office=fellow.office, living_space=fellow.living_space,
-                         need_accommodation=fellow.accommodation),
-                _warn=False
-            )
+    def bulk_save_to_db(self, rooms, people, batch_size=BATCH_SIZE, replace=False):
+        """
+        write rooms, fellows, staff with executemany inserts of batch_size rows inside a single transaction.
+        Rooms are given their ids here so people rows can reference them without reading them back
+        """
+        connection = self.connection
+        previous = self.set_pragmas(connection, BULK_PRAGMAS if self.fresh else ())
+        try:
+            with connection.begin():
+                if replace:
+                    self.delete_rows()
+                first_id = self.next_room_id()
+                room_ids = dict((room.name, room_id) for room_id, room in enumerate(rooms, first_id))
+
+                tables = [
+                    (RoomDB.__table__, (dict(self.room_row(room), id=room_ids[room.name]) for room in rooms)),
+                    (PersonDB.__table__, (self.person_row(person, room_ids) for person in self.iter_people(people))),
+                ]
+                for table, rows in tables:
+                    for batch in batches(rows, batch_size):
+                        connection.execute(table.insert(), batch)
+        finally:
+            self.set_pragmas(connection, previous)
+        self.fresh = False
 
-        for staff in people['staff']:
-            self.db.add(StaffDB(staff_id=staff.id, name=staff.name, office=staff.office), _warn=False)
+        return True
 
-        self.db.commit()
+    def clear(self):
+        """
+        delete all rooms and people
+        """
+        with self.connection.begin():
+            self.delete_rows()
+        self.fresh = False
+
+    def delete_rows(self):
+        for table in (PersonDB.__table__, RoomDB.__table__):
+            self.connection.execute(table.delete())
+
+    def upsert_to_db(self, rooms, people):
+        """
+        insert new rooms and insert or update the rows of the given fellows and staff in a single transaction.
+        Existing rooms and people keep their ids, so people referencing rooms stay valid and people keep their
+        place in the order rows are loaded in
+        """
+        room_table, person_table = RoomDB.__table__, PersonDB.__table__
+        people = list(self.iter_people(people))
+
+        connection = self.connection
+        with connection.begin():
+            existing = self.get_room_ids([room.name for room in rooms])
+            new_rooms = [room for room in rooms if room.name not in existing]
+            if new_rooms:
+                connection.execute(room_table.insert(), [self.room_row(room) for room in new_rooms])
+
+            room_names = set()
+            for person in people:
+                room_names.update([person.office, getattr(person, 'living_space', None)])
+            room_ids = self.get_room_ids([name for name in room_names if name is not None])
+
+            saved = set()
+            for batch in batches([person.id for person in people], DELETE_BATCH_SIZE):
+                for row in connection.execute(person_table.select().where(person_table.c.person_id.in_(batch))):
+                    saved.add(row[1])
+
+            rows = [self.person_row(person, room_ids) for person in people]
+            # the SET clause takes the row's columns, the saved id is bound separately for the WHERE clause
+            updates = [dict(row, saved_person_id=row['person_id']) for row in rows if row['person_id'] in saved]
+            inserts = [row for row in rows if row['person_id'] not in saved]
+            if updates:
+                connection.execute(person_table.update().where(
+                    person_table.c.person_id == bindparam('saved_person_id')), updates)
+            if inserts:
+                connection.execute(person_table.insert(), inserts)
+        self.fresh = False
 
         return True
 
-    def load_state(self):
+    def get_room_ids(self, names):
         """
-        loads the state of db to amity
-        :return:
+        :param names: room names
+        :return: dict of room name to id for the names that exist
         """
-        offices = {}
-        living_spaces = {}
-        fellows_list = []
-        staff_list = []
+        room_table = RoomDB.__table__
+        room_ids = {}
+        for batch in batches(names, DELETE_BATCH_SIZE):
+            for row in self.connection.execute(room_table.select().where(room_table.c.name.in_(batch))):
+                room_ids[row[1]] = row[0]
+        return room_ids
+
+    def next_room_id(self):
+        return self.connection.execute(text("SELECT COALESCE(MAX(id), 0) + 1 FROM rooms")).scalar()
+
+    @staticmethod
+    def iter_people(people):
+        for fellow in people['fellows']:
+            yield fellow
+        for staff in people['staff']:
+            yield staff
 
-        max_staff_id = 0
-        max_fellow_id = 0
+    @staticmethod
+    def room_row(room):
+        return {'name': room.name, 'type': room.type}
 
-        rooms_db = self.db.query(RoomDB.name, RoomDB.type).all()
+    @staticmethod
+    def person_row(person, room_ids):
+        """
+        :param room_ids: dict of room name to id for the rooms person is allocated
+        """
+        living_space = getattr(person, 'living_space', None)
+        return {'person_id': person.id, 'name': person.name, 'role': person.role,
+                'accommodation': getattr(person, 'accommodation', None),
+                'office_id': room_ids.get(person.office), 'living_space_id': room_ids.get(living_space)}
 
-        # retrieve and create rooms from db
-        for room in rooms_db:
-            if room.type == Constants.LIVING_SPACE:
-                living_space = LivingSpace(str(room.name))
-                living_spaces[living_space.name] = living_space
+    @staticmethod
+    def set_pragmas(connection, pragmas):
+        """
+        apply sqlite pragmas on the raw DBAPI connection, outside of any SQLAlchemy transaction
+        :param pragmas: sequence of (name, value)
+        :return: the previous values as a sequence of (name, value)
+        """
+        cursor = connection.connection.cursor()
+        try:
+            previous = []
+            for name, value in pragmas:
+                cursor.execute("PRAGMA {}".format(name))
+                previous.append((name, cursor.fetchone()[0]))
+                cursor.execute("PRAGMA {} = {}".format(name, value))
+            return previous
+        finally:
+            cursor.close()
+
+    def orm_save_to_db(self, rooms, people, replace=False):
+        """
+        write rooms, fellows, staff to database one ORM object at a time
+        """
+        if replace:
+            self.db.query(PersonDB).delete()
+            self.db.query(RoomDB).delete()
 
-            elif room.type == Constants.OFFICE:
-                office = Office(str(room.name))
-                offices[office.name] = office
+        room_ids = {}
+        for room in rooms:
+            room_db = RoomDB(room.name, room.type)
+            self.db.add(room_db, _warn=False)
+            self.db.flush()
+            room_ids[room.name] = room_db.id
 
-        # get staff members
-        staff_db = self.db.query(StaffDB).all()
-        for staff_data in staff_db:
-            staff = Staff(staff_data.staff_name, id=staff_data.staff_id)
+        for person in self.iter_people(people):
+            self.db.add(PersonDB(**self.person_row(person, room_ids)), _warn=False)
 
-            if staff_data.staff_office in offices:
-                    offices[staff_data.staff_office].allocate_space(staff)
+        self.db.commit()
+        self.fresh = False
 
-            if not max_staff_id or max_staff_id < staff.id:
-                max_staff_id = str(staff.id)
+        return True
 
-            staff_list.append(staff)
+    def load_rows(self):
+        """
+        read the saved state as plain column tuples, in the order rows were saved
+        :return: dict of lists of rooms (name, type), fellows (id, name, office, living space, accommodation)
+                 and staff (id, name, office)
+        """
+        rows = {'rooms': [], 'fellows': [], 'staff': []}
 
-        # get fellows members
-        fellow_db = self.db.query(FellowDB).all()
-        for fellow_data in fellow_db:
-            fellow = Fellow(fellow_data.fellow_name, id=fellow_data.fellow_id,
-                            accommodation=fellow_data.fellow_need_accommodation)
+        with self.connection.begin():
+            for name, room_type in self.connection.execute(text("SELECT name, type FROM rooms ORDER BY id")):
+                rows['rooms'].append((name, room_type))
 
-            if not max_fellow_id or max_fellow_id < fellow.id:
-                max_fellow_id = str(fellow.id)
+            for person_id, name, role, accommodation, office, living_space in self.connection.execute(
+                    text(SELECT_PEOPLE + " ORDER BY p.id")):
+                if role == Constants.FELLOW:
+                    rows['fellows'].append((person_id, name, office, living_space, accommodation))
+                else:
+                    rows['staff'].append((person_id, name, office))
 
-            if fellow_data.fellow_office in offices:
-                    offices[fellow_data.fellow_office].allocate_space(fellow)
+        return rows
 
-            if fellow_data.fellow_living_space in living_spaces:
-                    living_spaces[fellow_data.fellow_living_space].allocate_space(fellow)
+    def get_room(self, room_name):
+        """
+        read a room and its occupants directly from the database
+        :param room_name: room name
+        :return: dict with name, type and occupants as (id, name, role) tuples or None if there is no such room
+        """
+        with self.connection.begin():
+            room = self.connection.execute(text("SELECT id, name, type FROM rooms WHERE name = :name"),
+                                           {'name': room_name}).fetchone()
+            if room is None:
+                return None
 
-            fellows_list.append(fellow)
+            column = 'office_id' if room[2] == Constants.OFFICE else 'living_space_id'
+            occupants = self.connection.execute(
+                text("SELECT person_id, name, role FROM people WHERE {} = :room_id ORDER BY id".format(column)),
+                {'room_id': room[0]})
 
-        max_ids = {'(fellow': [int(max_fellow_id[2:])], 'staff': [int(max_staff_id[2:])]}
+            return {'name': room[1], 'type': room[2], 'occupants': [tuple(occupant) for occupant in occupants]}
 
-        return {'fellows': fellows_list, 'staff': staff_list, 'offices': offices.values(),
-                'living_spaces': living_spaces.values(), 'current_ids': max_ids}
+    def get_unallocated(self, role=None, room_type=None):
+        """
+        read people not fully allocated directly from the database, staff without an office and
+        fellows without an office or living space
+        :param role: (optional) Constants.STAFF or Constants.FELLOW
+        :param room_type: (optional) only people without a room of this type, fellows need a living space only if
+                          they requested accommodation
+        :return: list of (id, name, role, accommodation, office, living space) tuples
+        """
+        if room_type == Constants.OFFICE:
+            missing = "p.office_id IS NULL"
+        elif room_type == Constants.LIVING_SPACE:
+            missing = "p.role = :fellow AND p.accommodation = 'Y' AND p.living_space_id IS NULL"
+        else:
+            missing = ("(p.role = :staff AND p.office_id IS NULL) OR "
+                       "(p.role = :fellow AND (p.office_id IS NULL OR p.living_space_id IS NULL))")
+        query = SELECT_PEOPLE + " WHERE (" + missing + ")"
+        if role is not None:
+            query += " AND p.role = :role"
+
+        with self.connection.begin():
+            rows = self.connection.execute(text(query + " ORDER BY p.id"),
+                                           {'staff': Constants.STAFF, 'fellow': Constants.FELLOW, 'role': role})
+            return [tuple(row) for row in rows]
@@ -1,22 +1,181 @@
 from __future__ import print_function, unicode_literals
 import os
+from collections import deque
+from itertools import islice
+
+ROLES = ('FELLOW', 'STAFF')
+
+# target size of the byte ranges handed to each parse worker
+RANGE_SIZE = 4 * 1024 * 1024
+
+
+def parse_range(task):
+    """
+    parse the lines of a byte range of a people file, run in a worker process
+    :param task: tuple of file name, start and end offsets. start must be at the beginning of a line
+    :return: tuple of number of lines in the range and list of (line number within range, person, error)
+    """
+    file_name, start, end = task
+    entries = []
+    line_count = 0
+
+    with open(file_name, 'rb') as file_handle:
+        file_handle.seek(start)
+        while file_handle.tell() < end:
+            line = file_handle.readline()
+            if not line:
+                break
+            line_count += 1
+            fields = line.decode('utf-8').split()
+            if fields:
+                try:
+                    entries.append((line_count, FileUtil.parse_person(fields), None))
+                except ValueError as ex:
+                    entries.append((line_count, None, str(ex)))
+
+    return line_count, entries
 
 
 class FileUtil(object):
     @staticmethod
     def read_from_file(file_name):
-        people_data = []
+        """
+        stream the file line by line in file order
+        :param file_name: path to file
+        :return: generator of the whitespace separated fields of each non-empty line
+        """
+        for line_number, fields in FileUtil.read_lines(file_name):
+            yield fields
 
+    @staticmethod
+    def read_lines(file_name):
+        """
+        stream the file line by line in file order without holding it in memory
+        :param file_name: path to file
+        :return: generator of (line number, fields) for each non-empty line
+        """
         if not os.path.isfile(file_name):
             raise ValueError("cannot open file {} ".format(file_name))
 
         with open(file_name) as file_handle:
-            file_data = file_handle.readlines()
+            for line_number, line in enumerate(file_handle, 1):
+                fields = line.split()
+                if fields:
+                    yield line_number, fields
+
+    @staticmethod
+    def parse_file(file_name):
+        """
+        stream and validate a people file
+        :param file_name: path to file
+        :return: generator of (line number, (name, role, accommodation), error) in file order,
+                 where either the person tuple or the error is None
+        """
+        for line_number, fields in FileUtil.read_lines(file_name):
+            try:
+                yield line_number, FileUtil.parse_person(fields), None
+            except ValueError as ex:
+                yield line_number, None, str(ex)
+
+    @staticmethod
+    def parse_file_parallel(file_name, workers, range_size=RANGE_SIZE):
+        """
+        validate a people file across a pool of worker processes. The file is split into line aligned byte
+        ranges which are parsed in parallel and merged back in file order. At most one range per worker is parsed
+        ahead of the one being read, so memory stays bounded however slowly the entries are consumed
+        :param file_name: path to file
+        :param workers: number of worker processes
+        :param range_size: (optional) approximate bytes per range
+        :return: generator of (line number, (name, role, accommodation), error), same as parse_file
+        """
+        from multiprocessing import Pool
+
+        tasks = ((file_name, start, end) for start, end in FileUtil.split_file(file_name, workers, range_size))
+
+        pool = Pool(workers)
+        try:
+            pending = deque(pool.apply_async(parse_range, (task,)) for task in islice(tasks, workers))
+            line_offset = 0
+            while pending:
+                line_count, entries = pending.popleft().get()
+                # keep the workers busy while this range is read
+                for task in islice(tasks, 1):
+                    pending.append(pool.apply_async(parse_range, (task,)))
+
+                for line_number, person, error in entries:
+                    yield line_offset + line_number, person, error
+                line_offset += line_count
+        finally:
+            pool.terminate()
 
-            while file_data:
-                people_data.append(file_data.pop().strip().split())
+    @staticmethod
+    def split_file(file_name, parts, range_size=RANGE_SIZE):
+        """
+        split a file into byte ranges that start at the beginning of a line
+        :param file_name: path to file
+        :param parts: minimum number of ranges, if the file is large enough
+        :param range_size: (optional) maximum approximate bytes per range
+        :return: list of (start, end) offsets covering the whole file
+        """
+        if not os.path.isfile(file_name):
+            raise ValueError("cannot open file {} ".format(file_name))
+
+        size = os.path.getsize(file_name)
+        count = max(parts, -(-size // range_size), 1)
+        boundaries = [0]
+
+        with open(file_name, 'rb') as file_handle:
+            for i in range(1, count):
+                offset = size * i // count
+                if offset <= boundaries[-1]:
+                    continue
+                # step back one byte so a boundary already at a line start is kept
+                file_handle.seek(offset - 1)
+                file_handle.readline()
+                position = file_handle.tell()
+                if boundaries[-1] < position < size:
+                    boundaries.append(position)
+
+        boundaries.append(size)
+
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    @staticmethod
+    def parse_person(fields):
+        """
+        validate a people file entry i.e OLUWAFEMI SULE FELLOW Y
+        :param fields: whitespace separated fields of the line
+        :return: tuple of name, role and accommodation(None if not given)
+        """
+        if len(fields) < 3:
+            raise ValueError("expected <first_name> <last_name> <role> [<wants_accommodation>]")
+
+        role = fields[2].upper()
+        if role not in ROLES:
+            raise ValueError("role should be STAFF or FELLOW not {}".format(fields[2]))
+
+        accommodation = fields[3].upper() if len(fields) > 3 else None
+        if accommodation not in (None, 'Y', 'N'):
+            raise ValueError("accommodation should be Y or N not {}".format(fields[3]))
+
+        return " {} {}".format(fields[0], fields[1]), role, accommodation
+
+    @staticmethod
+    def read_plan(file_name):
+        """
+        read a relocation plan with one move per line i.e FL001 valhalla. Lines starting with # are skipped
+        :param file_name: path to file
+        :return: list of (person id, room name)
+        """
+        moves = []
+        for line_number, fields in FileUtil.read_lines(file_name):
+            if fields[0].startswith('#'):
+                continue
+            if len(fields) != 2:
+                raise ValueError("line {}: expected <person_id> <new_room_name>".format(line_number))
+            moves.append((fields[0].upper(), fields[1]))
 
-        return people_data
+        return moves
 
     @staticmethod
     def write_to_file(file_path, data):
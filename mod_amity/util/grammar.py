@@ -0,0 +1,113 @@
+from docopt import (AnyOptions, Argument, Command, DocoptExit, Dict, Option, TokenStream, extras, formal_usage,
+                    parse_argv, parse_defaults, parse_pattern, printable_usage)
+
+# stands in for the argument at an index while matching the shape of a command line
+SLOT = "\0"
+
+
+class Grammar(object):
+    """
+    A docopt usage message parsed once and matched against many command lines.
+    docopt() parses the usage message on every call, which costs more than most commands themselves; this does
+    the same steps as docopt 0.6.2 but keeps the parsed pattern between calls.
+    Command lines without options only match differently by their number of arguments and which of them are
+    command words, so the match of each such shape is kept too
+    """
+
+    def __init__(self, doc):
+        """
+        :param doc: docopt usage message, i.e a command's docstring
+        """
+        self.doc = doc
+        self.usage = printable_usage(doc)
+        self.options = parse_defaults(doc)
+        self.pattern = parse_pattern(formal_usage(self.usage), self.options)
+
+        pattern_options = set(self.pattern.flat(Option))
+        for any_options in self.pattern.flat(AnyOptions):
+            any_options.children = list(set(self.options) - pattern_options)
+        self.pattern.fix()
+        self.defaults = [(leaf.name, leaf.value) for leaf in self.pattern.flat()]
+        self.repeated = [name for name, value in self.defaults if isinstance(value, list)]
+        self.commands = set(leaf.name for leaf in self.pattern.flat(Command))
+        # shape of a command line to its matched (name, argument index, list of indices or value), or None if it
+        # does not match
+        self.shapes = {}
+
+    def parse(self, argv):
+        """
+        match a command line, same as docopt(doc, argv)
+        :param argv: argument string or list
+        :return: dict of arguments and options
+        :raise DocoptExit: if argv does not match the usage
+        """
+        DocoptExit.usage = self.usage
+        tokens = argv.split() if hasattr(argv, 'split') else list(argv)
+        if any(token.startswith('-') for token in tokens):
+            argv = parse_argv(TokenStream(tokens, DocoptExit), list(self.options), False)
+            extras(True, None, argv, self.doc)
+            collected = self.match(argv)
+        else:
+            shape = tuple(token if token in self.commands else None for token in tokens)
+            if shape not in self.shapes:
+                self.shapes[shape] = self.match_shape(shape)
+            matches = self.shapes[shape]
+            collected = None if matches is None else self.fill(matches, tokens)
+
+        if collected is None:
+            raise DocoptExit()
+
+        arguments = Dict(self.defaults)
+        # repeated arguments that did not match share the pattern's default list, callers get their own
+        for name in self.repeated:
+            arguments[name] = list(arguments[name])
+        arguments.update(collected)
+        return arguments
+
+    def match(self, argv):
+        """
+        :param argv: parsed command line
+        :return: list of matched (name, value) or None if argv does not match
+        """
+        matched, left, collected = self.pattern.match(argv)
+        if matched and left == []:
+            return [(leaf.name, leaf.value) for leaf in collected]
+        return None
+
+    def match_shape(self, shape):
+        """
+        match a command line without options, with the arguments that are not command words replaced by slots
+        :param shape: tuple of command words, or None for other arguments
+        :return: list of matched (name, argument index, list of argument indices and words or value), or None
+        """
+        # without options every token is a positional argument, as parse_argv would find
+        collected = self.match([Argument(None, SLOT + str(index) if token is None else token)
+                                for index, token in enumerate(shape)])
+        if collected is None:
+            return None
+
+        def index(value):
+            return int(value[len(SLOT):]) if hasattr(value, 'startswith') and value.startswith(SLOT) else None
+
+        matches = []
+        for name, value in collected:
+            if isinstance(value, list):
+                # command words can be matched as arguments too, those are kept as they are
+                matches.append((name, None, [item if index(item) is None else index(item) for item in value]))
+            else:
+                matches.append((name, index(value), value))
+        return matches
+
+    @staticmethod
+    def fill(matches, tokens):
+        """
+        :return: list of matched (name, value) with the arguments put back in their slots
+        """
+        collected = []
+        for name, index, value in matches:
+            if index is not None:
+                value = tokens[index]
+            elif isinstance(value, list):
+                value = [tokens[item] if isinstance(item, int) else item for item in value]
+            collected.append((name, value))
+        return collected
@@ -0,0 +1,140 @@
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+from collections import OrderedDict
+
+# commits between fsyncs. Every commit reaches the OS so only a machine crash can lose the unsynced ones
+SYNC_EVERY = 16
+
+JOURNAL_SUFFIX = '.journal'
+
+
+class Journal(object):
+    """
+    Append-only log of amity mutations, one JSON record per line.
+    Records hold the resulting state of the room or person that changed rather than the command, so
+    replaying them is deterministic (no random allocation) and replaying a record twice is harmless.
+    Records are held until commit, where changes to the same room or person are folded into the latest one,
+    written to the OS in a single write and fsynced every sync_every commits
+    """
+
+    def __init__(self, path, sync_every=SYNC_EVERY):
+        """
+        :param path: path to the journal file, created if missing
+        :param sync_every: (optional) number of commits between fsyncs, 1 syncs every commit
+        """
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.pending = OrderedDict()
+        self.unsynced = 0
+
+        Journal.trim(path)
+        self.file = io.open(path, 'ab')
+
+    @staticmethod
+    def path_for(db_path):
+        """
+        :param db_path: path to the snapshot sqlite database
+        :return: path to the journal kept next to it
+        """
+        return db_path + JOURNAL_SUFFIX
+
+    def append(self, key, record):
+        """
+        queue a record for the next commit, replacing any queued record with the same key
+        :param key: hashable id of the room or person the record describes
+        :param record: json serializable dict
+        """
+        # re-inserting moves the record after any record it may refer to i.e a room created after the person
+        self.pending.pop(key, None)
+        self.pending[key] = record
+
+    def commit(self):
+        """
+        write queued records to the journal
+        :return: number of records written
+        """
+        if not self.pending:
+            return 0
+
+        data = "".join(json.dumps(record, separators=(',', ':')) + "\n" for record in self.pending.values())
+        self.file.write(data.encode('utf-8'))
+        self.file.flush()
+
+        written = len(self.pending)
+        self.pending.clear()
+
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+        return written
+
+    def sync(self):
+        """
+        force committed records to disk
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def truncate(self):
+        """
+        drop all records, once they are folded into a snapshot
+        """
+        self.pending.clear()
+        self.file.truncate(0)
+        self.sync()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.commit()
+        self.sync()
+        self.file.close()
+
+    @staticmethod
+    def read(path):
+        """
+        stream records from a journal in the order they were written.
+        A final line without a newline is an interrupted write and is ignored
+        :param path: path to the journal file
+        :return: generator of record dicts, empty if the file is missing
+        """
+        if not os.path.exists(path):
+            return
+
+        with io.open(path, 'rb') as file_handle:
+            for line_number, line in enumerate(file_handle, 1):
+                if not line.endswith(b"\n"):
+                    return
+                try:
+                    yield json.loads(line.decode('utf-8'))
+                except ValueError:
+                    raise ValueError("corrupt journal {} at line {}".format(path, line_number))
+
+    @staticmethod
+    def trim(path):
+        """
+        cut an interrupted write off the end of the journal so new records start on a fresh line
+        """
+        if not os.path.exists(path):
+            return
+
+        with io.open(path, 'r+b') as file_handle:
+            size = file_handle.seek(0, os.SEEK_END)
+            end = size
+            # walk back a block at a time to the last newline
+            while end > 0:
+                start = max(0, end - 4096)
+                file_handle.seek(start)
+                newline = file_handle.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+
+            if end < size:
+                file_handle.truncate(end)
@@ -0,0 +1,197 @@
+from __future__ import unicode_literals
+
+import csv
+import json
+
+from mod_amity.models import Constants
+
+# room type filter values accepted by print_allocations and print_unallocated
+ROOM_TYPES = {'office': Constants.OFFICE, 'living': Constants.LIVING_SPACE}
+
+INDENT = "    "
+
+
+def person_json(person):
+    data = {'id': person.id, 'name': person.name.strip(), 'role': person.role, 'office': person.office}
+    if person.role == Constants.FELLOW:
+        data['accommodation'] = person.accommodation
+        data['living_space'] = person.living_space
+    return data
+
+
+def room_json(room):
+    return {'name': room.name, 'type': room.type, 'capacity': room.capacity,
+            'occupants': [person_json(occupant) for occupant in room.occupants]}
+
+
+def org_table(rows, headers, missing="---"):
+    """
+    format rows as an org-mode table, the tabulate orgtbl layout, without tabulate's per-call overhead
+    :param rows: list of row lists
+    :param headers: column titles
+    :return: table text without a trailing newline
+    """
+    rows = [[missing if cell is None else "{}".format(cell).strip() for cell in row] for row in rows]
+    # like tabulate, headers get two spaces of padding
+    widths = [max([len(header) + 2] + [len(row[column]) for row in rows]) for column, header in enumerate(headers)]
+
+    def line(cells):
+        return "| " + " | ".join(cell.ljust(width) for cell, width in zip(cells, widths)) + " |"
+
+    separator = "|" + "+".join("-" * (width + 2) for width in widths) + "|"
+
+    return "\n".join([line(headers), separator] + [line(row) for row in rows])
+
+
+class TextReport(object):
+    """
+    Human readable report, as printed on screen. Each room's occupants are tabulated on their own and
+    unallocated persons are written as fixed width rows, so nothing waits for the whole report
+    """
+    row_format = "| {:>6} | {:<6} | {:<30} | {:<15} | {:<15} |"
+
+    def __init__(self, out):
+        self.out = out
+        self.depth = 0
+        self.rows = 0
+
+    def write(self, depth, text):
+        prefix = INDENT * depth
+        self.out.write("".join(prefix + line + "\n" for line in text.split("\n")))
+
+    def begin(self, title, kind):
+        if title:
+            self.write(0, title)
+            self.depth = 1
+
+    def section(self, title):
+        self.write(self.depth, title)
+        self.rows = 0
+
+    def room(self, room):
+        self.write(self.depth + 1, room.name)
+        occupants = [[occupant.id, occupant.name, occupant.role] for occupant in room.occupants]
+        self.write(self.depth + 2, org_table(occupants, ['ID', 'NAME', 'ROLE']))
+
+    def person(self, person):
+        if not self.rows:
+            self.write(self.depth + 1, self.row_format.format("", "ID", "NAME", "OFFICE", "LIVING SPACE"))
+            self.write(self.depth + 1, "|--------+--------+--------------------------------+"
+                                       "-----------------+-----------------|")
+        self.rows += 1
+        living_space = person.living_space if person.role == Constants.FELLOW else None
+        self.write(self.depth + 1, self.row_format.format(self.rows, person.id, person.name.strip(),
+                                                          person.office or "---", living_space or "---"))
+
+    def empty(self, message):
+        self.write(self.depth + 1, message)
+
+
+class CsvReport(object):
+    """
+    One CSV row per room occupant (rooms without occupants get a row with empty person columns)
+    or per unallocated person
+    """
+    headers = {'allocations': ['room', 'type', 'id', 'name', 'role'],
+               'unallocated': ['id', 'name', 'role', 'office', 'living_space']}
+
+    def __init__(self, out):
+        self.writer = csv.writer(out, lineterminator="\n")
+
+    def begin(self, title, kind):
+        self.writer.writerow(self.headers[kind])
+
+    def section(self, title):
+        pass
+
+    def room(self, room):
+        if not room.occupants:
+            self.writer.writerow([room.name, room.type, '', '', ''])
+        for occupant in room.occupants:
+            self.writer.writerow([room.name, room.type, occupant.id, occupant.name.strip(), occupant.role])
+
+    def person(self, person):
+        living_space = person.living_space if person.role == Constants.FELLOW else None
+        self.writer.writerow([person.id, person.name.strip(), person.role, person.office or '', living_space or ''])
+
+    def empty(self, message):
+        pass
+
+
+class JsonLinesReport(object):
+    """
+    One JSON object per line for each room or unallocated person
+    """
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title, kind):
+        pass
+
+    def section(self, title):
+        pass
+
+    def room(self, room):
+        self.out.write(json.dumps(room_json(room)) + "\n")
+
+    def person(self, person):
+        self.out.write(json.dumps(person_json(person)) + "\n")
+
+    def empty(self, message):
+        pass
+
+
+REPORT_FORMATS = {'text': TextReport, 'csv': CsvReport, 'jsonl': JsonLinesReport}
+
+
+def get_writer(out, report_format):
+    if report_format not in REPORT_FORMATS:
+        raise ValueError("format should be one of {}".format(", ".join(sorted(REPORT_FORMATS))))
+    return REPORT_FORMATS[report_format](out)
+
+
+def write_allocations(out, sections, report_format='text'):
+    """
+    stream rooms and their occupants to out as they are read
+    :param out: writable text stream
+    :param sections: list of (title, rooms) i.e [("Offices", offices)], rooms can be any iterable
+    :param report_format: (optional) text, csv or jsonl
+    :return: number of rooms written
+    """
+    writer = get_writer(out, report_format)
+    writer.begin(None, 'allocations')
+
+    count = 0
+    for title, rooms in sections:
+        writer.section(title)
+        for room in rooms:
+            writer.room(room)
+            count += 1
+
+    return count
+
+
+def write_unallocated(out, sections, report_format='text'):
+    """
+    stream unallocated persons to out as they are read
+    :param out: writable text stream
+    :param sections: list of (title, persons) i.e [("Staff", staff)], persons can be any iterable
+    :param report_format: (optional) text, csv or jsonl
+    :return: number of persons written
+    """
+    writer = get_writer(out, report_format)
+    writer.begin("Unallocated Persons", 'unallocated')
+
+    count = 0
+    for number, (title, people) in enumerate(sections, 1):
+        writer.section("{}. {}".format(number, title))
+        written = 0
+        for person in people:
+            writer.person(person)
+            written += 1
+        if not written:
+            writer.empty("All {} Allocated".format(title))
+        count += written
+
+    return count
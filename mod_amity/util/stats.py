@@ -0,0 +1,158 @@
+from __future__ import division
+
+import functools
+import inspect
+import json
+import random
+import timeit
+
+from mod_amity.locks import NULL_LOCK
+
+# public Amity operations that are timed while stats are enabled
+OPERATIONS = ('create_office', 'create_living_space', 'add_person', 'allocate_person', 'allocate_batch',
+              'relocate_person', 'relocate_many', 'find_person_by_name', 'find_person_by_id', 'get_rooms',
+              'get_unallocated_persons', 'get_free_rooms', 'count_free_seats', 'get_fullest_rooms', 'load_people',
+              'iter_load_people', 'save_state', 'load_state', 'recover', 'compact')
+
+PERCENTILES = (50, 90, 99)
+
+# latencies kept per operation for percentiles, older calls are sampled so memory stays bounded
+SAMPLE_SIZE = 1024
+
+
+class OperationStats(object):
+    """
+    Call count, total and max latency of one operation, plus a uniform sample of its latencies for percentiles
+    """
+    __slots__ = ('count', 'total', 'max', 'samples', 'rng')
+
+    def __init__(self, rng):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        self.rng = rng
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+        # reservoir sampling keeps every call equally likely to be in the sample
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(elapsed)
+        else:
+            position = self.rng.randint(0, self.count - 1)
+            if position < SAMPLE_SIZE:
+                self.samples[position] = elapsed
+
+    def percentile(self, percent):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100.0))]
+
+    def to_dict(self):
+        data = {'count': self.count, 'total': self.total, 'mean': self.total / self.count, 'max': self.max}
+        for percent in PERCENTILES:
+            data['p{}'.format(percent)] = self.percentile(percent)
+        return data
+
+
+class Stats(object):
+    """
+    Timing and counters for an Amity instance.
+    Attaching wraps the instance's public operations so each call is counted and timed, and detaching removes the
+    wrappers, so an amity without stats runs exactly the code it would without this module.
+    Rooms examined by scans over the rooms, i.e counting free slots, are counted per operation
+    """
+
+    def __init__(self, lock=NULL_LOCK, seed=0):
+        """
+        :param lock: (optional) lock guarding the counters when amity is shared across threads
+        :param seed: (optional) seed for the latency sampling
+        """
+        self.lock = lock
+        self.rng = random.Random(seed)
+        self.operations = {}
+        self.room_scans = {}
+
+    def attach(self, amity):
+        for name in OPERATIONS:
+            method = getattr(amity, name)
+            wrap = self.timed_generator if inspect.isgeneratorfunction(method) else self.timed
+            # instance attributes shadow the class methods, so internal calls are timed too
+            setattr(amity, name, wrap(name, method))
+
+    @staticmethod
+    def detach(amity):
+        for name in OPERATIONS:
+            amity.__dict__.pop(name, None)
+
+    def timed(self, name, method):
+        @functools.wraps(method)
+        def timed_call(*args, **kwargs):
+            start = timeit.default_timer()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, timeit.default_timer() - start)
+
+        return timed_call
+
+    def timed_generator(self, name, method):
+        """
+        time a generator over all its items, excluding the time the caller spends between them
+        """
+        @functools.wraps(method)
+        def timed_iteration(*args, **kwargs):
+            elapsed = 0.0
+            items = method(*args, **kwargs)
+            try:
+                while True:
+                    start = timeit.default_timer()
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += timeit.default_timer() - start
+                    yield item
+            finally:
+                self.record(name, elapsed)
+
+        return timed_iteration
+
+    def record(self, name, elapsed):
+        with self.lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = OperationStats(self.rng)
+            operation.add(elapsed)
+
+    def scanned(self, name, rooms):
+        """
+        count rooms examined by a scan
+        :param name: operation scanning
+        :param rooms: number of rooms examined
+        """
+        with self.lock:
+            self.room_scans[name] = self.room_scans.get(name, 0) + rooms
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.room_scans.clear()
+
+    def to_dict(self):
+        """
+        :return: dict of operations, with count and latencies in seconds, and room scans
+        """
+        with self.lock:
+            return {'operations': dict((name, operation.to_dict()) for name, operation in self.operations.items()),
+                    'room_scans': dict(self.room_scans)}
+
+    def dump(self, file_name):
+        """
+        write the stats as JSON
+        """
+        with open(file_name, 'w') as out:
+            json.dump(self.to_dict(), out, indent=2, sort_keys=True)
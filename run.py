@@ -4,16 +4,25 @@
 Usage:
     amity create_room (living|office) <room_name>...
     amity add_person <first_name> <last_name> (fellow|staff) [<wants_accomodation>]
-    amity reallocate_person <person_id> <new_room_name>
+    amity reallocate_person (<person_id> <new_room_name> | --plan=<file_name>)
     amity load_people <filename>
-    amity print_allocations [-o <filename>]
-    amity print_unallocated [-o <filename>]
+    amity print_allocations [-o <filename>] [--format=<format>] [--type=<room_type>]
+    amity print_unallocated [-o <filename>] [--format=<format>] [--type=<room_type>]
     amity print_room <room_name>
-    amity (-i | --interactive)
+    amity (-i | --interactive) [--strategy=<strategy>]
+    amity --serve [--host=<host>] [--port=<port>] [--db=<sqlite_database>] [--strategy=<strategy>]
+    amity --script=<file_name> [--stop-on-error] [--strategy=<strategy>]
     amity (-h | --help)
 Options:
     -o, --output  Save to a txt file
     -i, --interactive  Interactive Mode
+    --serve  Serve JSON requests over TCP (python 3.7+)
+    --host=<host>  Address to listen on [default: 127.0.0.1]
+    --port=<port>  Port to listen on [default: 8765]
+    --db=<sqlite_database>  Recover from and journal to the database while serving
+    --script=<file_name>  Run the commands in a file, one per line as typed in interactive mode
+    --stop-on-error  Stop the script at the first failed command
+    --strategy=<strategy>  How rooms are picked: random, least_loaded or best_fit [default: random]
     -h, --help  Show this screen and exit.
 """
 
@@ -22,31 +31,38 @@ from __future__ import print_function, unicode_literals
 import cmd
 import os
 import sys
+from contextlib import contextmanager
 
-from clint.textui import indent, puts
 from docopt import docopt, DocoptExit
-from tabulate import tabulate
 
 from mod_amity.amity import Amity
-from mod_amity.models import Constants
+from mod_amity.models import Constants, Fellow, Staff
 from mod_amity.util.file import FileUtil
+from mod_amity.util.grammar import Grammar
+from mod_amity.util.journal import Journal, SYNC_EVERY
+
+# clint, tabulate and the report writers are imported by the commands using them, so starting the cli,
+# i.e for --help or a scripted command, only loads what that command needs
 
 
 def docopt_cmd(func):
     """
     This decorator is used to simplify the try/except block and pass the result
     of the docopt parsing to the called action.
+    The usage in the docstring is parsed on the first call and kept for the next ones.
     """
 
     def fn(self, arg):
         try:
-            opt = docopt(fn.__doc__, arg)
+            if fn.grammar is None:
+                fn.grammar = Grammar(fn.__doc__)
+            opt = fn.grammar.parse(arg)
 
         except DocoptExit as e:
             # The DocoptExit is thrown when the args do not match.
             # We print a message to the user and the usage block.
 
-            print('Invalid Command!')
+            self.fail('Invalid Command!')
             print(e)
             return
 
@@ -61,9 +77,105 @@ def docopt_cmd(func):
     fn.__name__ = func.__name__
     fn.__doc__ = func.__doc__
     fn.__dict__.update(func.__dict__)
+    fn.grammar = None
     return fn
 
 
+def puts(text=""):
+    from clint.textui import puts as clint_puts
+    # clint binds the stream on import, the current one is passed so script mode can buffer output
+    clint_puts(text, stream=sys.stdout.write)
+
+
+def indent(count):
+    from clint.textui import indent as clint_indent
+    return clint_indent(count)
+
+
+def get_room_type(room_type):
+    """
+    :param room_type: room type filter option, office or living
+    :return: Constants.OFFICE, Constants.LIVING_SPACE or None if not given
+    """
+    from mod_amity.util.report import ROOM_TYPES
+
+    if room_type is None:
+        return None
+    if room_type.lower() not in ROOM_TYPES:
+        raise ValueError("room type should be office or living")
+    return ROOM_TYPES[room_type.lower()]
+
+
+def get_db_person(row):
+    """
+    :param row: (id, name, role, accommodation, office, living space) as read from the database
+    :return: Fellow or Staff with the row's rooms set, for the report writers
+    """
+    person_id, name, role, accommodation, office, living_space = row
+    if role == Constants.FELLOW:
+        person = Fellow(name, accommodation or 'N', id=person_id)
+        person.living_space = living_space
+    else:
+        person = Staff(name, id=person_id)
+    person.office = office
+    return person
+
+
+def get_number(args, option, default=None):
+    """
+    :param args: parsed command arguments
+    :param option: option name i.e --seed
+    :param default: (optional) value if the option is not given
+    :return: the option's value as an int
+    """
+    if args[option] is None:
+        return default
+    try:
+        return int(args[option])
+    except ValueError:
+        raise ValueError("{} should be a number".format(option))
+
+
+@contextmanager
+def open_report(file_name):
+    """
+    stream a report to file_name, next to run.py, or to the screen if not given
+    """
+    if not file_name:
+        yield sys.stdout
+        return
+
+    file_path = os.path.dirname(os.path.realpath(__file__)) + "/" + file_name
+    with open(file_path, 'w') as out:
+        yield out
+    print("Successfully wrote data to {}".format(file_path))
+
+
+class BufferedOutput(object):
+    """
+    Collects what is written and passes it on in large chunks, so a script doesn't pay for a write per line
+    """
+
+    def __init__(self, out, chunks=4096):
+        """
+        :param out: stream written to
+        :param chunks: (optional) number of writes collected before passing them on
+        """
+        self.out = out
+        self.size = chunks
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+        if len(self.chunks) >= self.size:
+            self.flush()
+
+    def flush(self):
+        self.out.write("".join(self.chunks))
+        self.out.flush()
+        self.chunks = []
+
+
 amity = Amity()
 
 
@@ -74,10 +186,10 @@ class AmityRun(cmd.Cmd):
       Usage:
             amity create_room (living|office) <room_name>...
             amity add_person <first_name> <last_name> (fellow|staff) [<wants_accomodation>]
-            amity reallocate_person <person_id> <new_room_name>
+            amity reallocate_person (<person_id> <new_room_name> | --plan=<file_name>)
             amity load_people <filename>
-            amity print_allocations [-o <filename>]
-            amity print_unallocated [-o <filename>]
+            amity print_allocations [-o <filename>] [--format=<format>] [--type=<room_type>]
+            amity print_unallocated [-o <filename>] [--format=<format>] [--type=<room_type>]
             amity print_room <room_name>
             amity (-i | --interactive)
             amity (-h | --help)
@@ -87,6 +199,56 @@ class AmityRun(cmd.Cmd):
     """
     prompt = '(amity) '
 
+    def __init__(self, *args, **kwargs):
+        cmd.Cmd.__init__(self, *args, **kwargs)
+        # failed commands, counted for the script summary
+        self.errors = 0
+
+    def fail(self, message):
+        """
+        report a failed command
+        """
+        self.errors += 1
+        puts(message)
+
+    def default(self, line):
+        self.fail("*** Unknown syntax: " + line)
+
+    def run_script(self, file_name, stop_on_error=False):
+        """
+        run commands from a file, one per line as typed in interactive mode. Blank lines and lines starting
+        with # are skipped. Output is buffered and the run ends with a summary
+        :param file_name: path to the script
+        :param stop_on_error: (optional) stop at the first failed command
+        :return: dict of counts of commands run and failed
+        """
+        commands = 0
+        failed_line = None
+        stdout = sys.stdout
+        sys.stdout = BufferedOutput(stdout)
+        try:
+            with open(file_name) as script:
+                for line_number, line in enumerate(script, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+
+                    errors = self.errors
+                    commands += 1
+                    self.onecmd(line)
+                    self.postcmd(False, line)
+                    if stop_on_error and self.errors > errors:
+                        failed_line = line_number
+                        break
+        finally:
+            sys.stdout.flush()
+            sys.stdout = stdout
+
+        if failed_line is not None:
+            print("Stopped at line {}: {}".format(failed_line, line))
+        print("Ran {} commands, {} failed".format(commands, self.errors))
+        return {'commands': commands, 'failed': self.errors}
+
     @docopt_cmd
     def do_add_person(self, args):
         """
@@ -96,7 +258,7 @@ class AmityRun(cmd.Cmd):
         role = args["<role>"].upper()
 
         if role not in ["FELLOW", "STAFF"]:
-            print("Invalid: role should STAFF or FELLOW")
+            self.fail("Invalid: role should STAFF or FELLOW")
             return
 
         accommodation = args['<wants_accommodation>'].upper() if args['<wants_accommodation>'] else None
@@ -116,7 +278,7 @@ class AmityRun(cmd.Cmd):
                 else:
                     print("No vacant living spaces")
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_create_room(self, args):
@@ -126,7 +288,7 @@ class AmityRun(cmd.Cmd):
         room_type = args["<room_type>"].upper()
 
         if room_type not in ["LIVING", "OFFICE"]:
-            print("Invalid Command: valid room names 'LIVING', 'OFFICE']")
+            self.fail("Invalid Command: valid room names 'LIVING', 'OFFICE']")
             return
 
         room_names = args['<room_names>']
@@ -142,163 +304,140 @@ class AmityRun(cmd.Cmd):
 
             print("Created {} rooms: {}".format(room_type, ", ".join(room_names)))
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_reallocate_person(self, args):
         """
-        Usage: reallocate_person <person_id> <new_room_name>
+        Usage: reallocate_person (<person_id> <new_room_name> | --plan=<file_name>)
         """
-        person_id = args['<person_id>'].upper()
-        new_room_name = args['<new_room_name>']
-
         try:
+            if args['--plan']:
+                # all moves in the plan succeed or none do
+                moves = FileUtil.read_plan(os.path.dirname(os.path.realpath(__file__)) + "/" + args['--plan'])
+                relocations = amity.relocate_many(moves)
+            else:
+                relocations = [amity.relocate_person(args['<person_id>'].upper(), args['<new_room_name>'])]
 
-            relocate_data = amity.relocate_person(person_id, new_room_name)
-
-            print("{} relocated from {} to {}".format(relocate_data['person'], relocate_data['old_room'],
-                                                      relocate_data['new_room']))
+            for relocate_data in relocations:
+                print("{} relocated from {} to {}".format(relocate_data['person'], relocate_data['old_room'],
+                                                          relocate_data['new_room']))
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_print_unallocated(self, args):
         """
-        Usage: print_unallocated [<file_name>]
+        Usage: print_unallocated [<file_name>] [--format=<format>] [--type=<room_type>] [--db=sqlite_database]
         """
-        try:
+        from mod_amity.util.report import write_unallocated
 
-            unallocated = amity.get_unallocated_persons()
-
-            puts("Unallocated Persons")
-            with indent(4):
-                puts("1. Staff")
-                with indent(4):
-                    if unallocated["staff"]:
-                        puts(tabulate(
-                            [[i + 1, staff.id, staff.name] for i, staff in enumerate(unallocated["staff"])],
-                            headers=['ID', 'NAME'], tablefmt='orgtbl', missingval="---")
-                        )
-                    else:
-                        puts("All Staff Allocated")
+        try:
+            room_type = get_room_type(args['--type'])
+            if args['--db']:
+                # served straight from the database, no load_state needed
+                db_path = os.path.dirname(os.path.realpath(__file__)) + "/" + args['--db']
+                if not os.path.exists(db_path):
+                    raise ValueError("cannot open db at {} ".format(db_path))
+                storage = amity.open_storage(db_path)
+                sections = [(title, (get_db_person(row) for row in storage.get_unallocated(role, room_type)))
+                            for title, role in [("Staff", Constants.STAFF), ("Fellows", Constants.FELLOW)]]
+            else:
+                sections = [("Staff", amity.iter_unallocated(Constants.STAFF, room_type)),
+                            ("Fellows", amity.iter_unallocated(Constants.FELLOW, room_type))]
+            if room_type == Constants.LIVING_SPACE:
+                sections = sections[1:]
 
-            with indent(4):
-                puts("2. Fellows")
-                with indent(4):
-                    if unallocated["fellows"]:
-                        puts(tabulate(
-                            [[i + 1, fellow.id, fellow.name, fellow.office, fellow.living_space] for i, fellow in
-                             enumerate(unallocated["fellows"])],
-                            headers=['ID', 'NAME', 'OFFICE', 'LIVING SPACE'], tablefmt='orgtbl',
-                            missingval="---"))
-                    else:
-                        puts("All Fellows Allocated")
-
-            file_name = args['<file_name>'] if args['<file_name>'] else None
-
-            if file_name:
-                output_data = []
-                for person_type, person_list in unallocated.items():
-                    output_data.append(person_type.upper())
-                    output_data.append("-"*75)
-                    for person in person_list:
-                        output_data.append(person.name.title())
-                file_path = os.path.dirname(os.path.realpath(__file__)) + "/" + file_name
-
-                if FileUtil.write_to_file(file_path, output_data):
-                    print ("Successfully wrote data to {}".format(file_path))
+            with open_report(args['<file_name>']) as out:
+                write_unallocated(out, sections, args['--format'] or 'text')
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_print_room(self, args):
         """
-            Usage: print_room <room_name>
+            Usage: print_room <room_name> [--db=sqlite_database]
         """
+        from tabulate import tabulate
+
         room_name = args["<room_name>"]
 
         try:
-            room = amity.get_rooms(room_name)
+            if args['--db']:
+                # served straight from the database, no load_state needed
+                db_path = os.path.dirname(os.path.realpath(__file__)) + "/" + args['--db']
+                if not os.path.exists(db_path):
+                    raise ValueError("cannot open db at {} ".format(db_path))
+                room = amity.open_storage(db_path).get_room(room_name)
+                if room is None:
+                    raise ValueError("cannot find room named {}".format(room_name))
+                name, room_type, occupants = room['name'], room['type'], room['occupants']
+            else:
+                room = amity.get_rooms(room_name)
+                if room is None:
+                    raise ValueError("cannot find room named {}".format(room_name))
+                name, room_type = room.name, room.type
+                occupants = [(occupant.id, occupant.name, occupant.role) for occupant in room.occupants]
 
             with indent(4):
-                puts("Room: {}({})".format(room.name.upper(), room.type))
+                puts("Room: {}({})".format(name.upper(), room_type))
                 with indent(2):
                     puts("Occupants: ")
-                    occupants = [[i + 1, occupant.id, occupant.name, occupant.role] for i, occupant in
-                                 enumerate(room.occupants)]
+                    occupants = [[i + 1, person_id, person_name, role] for i, (person_id, person_name, role) in
+                                 enumerate(occupants)]
                     puts(tabulate(occupants,
                                   headers=['ID', 'NAME', 'ROLE'], tablefmt='orgtbl', missingval="---"))
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_print_allocations(self, args):
-        """Usage: print_allocations [<file_name>]
+        """Usage: print_allocations [<file_name>] [--format=<format>] [--type=<room_type>]
         """
-        try:
-            rooms = amity.get_rooms()
-
-            puts("Offices")
-            with indent(4):
-                for office in rooms['offices']:
-                    puts(office.name)
-                    with indent(4):
-                        occupants = [[occupant.id, occupant.name, occupant.role] for occupant in office.occupants]
-                        puts(tabulate(occupants,
-                                      headers=['ID', 'NAME', 'ROLE'], tablefmt='orgtbl', missingval="---"))
-
-            puts("Living Spaces")
-            with indent(4):
-                for living_space in rooms['living_spaces']:
-                    puts(living_space.name)
-                    with indent(4):
-                        occupants = [[occupant.id, occupant.name, occupant.role] for occupant in living_space.occupants]
-                        puts(tabulate(occupants,
-                                      headers=['ID', 'NAME', 'ROLE'], tablefmt='orgtbl', missingval="---"))
-
-            # write data to file
-            file_name = args['<file_name>'] if args['<file_name>'] else None
-
-            if file_name:
-                output_data = []
+        from mod_amity.util.report import write_allocations
 
-                for room in (rooms['offices']+rooms['living_spaces']):
-                    if room.occupants:
-                        output_data.append(room.name.upper())
-                        output_data.append("-" * 75)
-
-                        output_data.append(", ".join([person.name.upper() for person in room.occupants]))
-                        output_data.append("\n")
-
-                file_path = os.path.dirname(os.path.realpath(__file__)) + "/" + file_name
+        try:
+            room_type = get_room_type(args['--type'])
+            sections = [(title, amity.rooms.of_type(section_type)) for title, section_type in
+                        [("Offices", Constants.OFFICE), ("Living Spaces", Constants.LIVING_SPACE)]
+                        if room_type in (None, section_type)]
 
-                if FileUtil.write_to_file(file_path, output_data):
-                        print("Successfully wrote data to {}".format(file_path))
+            with open_report(args['<file_name>']) as out:
+                write_allocations(out, sections, args['--format'] or 'text')
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_load_people(self, args):
         """
-        Usage: load_people <file_name>
+        Usage: load_people <file_name> [--seed=<seed>] [--chunk=<size>] [--workers=<count>]
         """
         file_name = args['<file_name>']
 
         try:
-            loaded_people = amity.load_people(os.path.dirname(os.path.realpath(__file__)) + "/" + file_name)
-
+            seed = get_number(args, '--seed')
+            chunk_size = get_number(args, '--chunk', 1000)
+            workers = get_number(args, '--workers')
+            errors = []
+            loaded_people = amity.iter_load_people(os.path.dirname(os.path.realpath(__file__)) + "/" + file_name,
+                                                   strategy=amity.strategy, seed=seed, chunk_size=chunk_size,
+                                                   errors=errors, workers=workers)
+
+            # rows are printed as each chunk is allocated, so the table uses fixed column widths
+            row_format = "| {:>6} | {:<6} | {:<30} | {:<6} | {:<7} |"
             puts("Loaded Persons")
             with indent(4):
-                puts(
-                    tabulate(
-                        [[i + 1, person.id, person.name, person.role,
-                          person.accommodation if person.role == Constants.FELLOW else None] for i, person in
-                         enumerate(loaded_people)],
-                        headers=['ID', 'NAME', 'ROLE', 'ACCOMM.'], tablefmt='orgtbl', missingval="----"
-                    )
-                )
+                puts(row_format.format("", "ID", "NAME", "ROLE", "ACCOMM."))
+                puts("|--------+--------+--------------------------------+--------+---------|")
+                for i, person in enumerate(loaded_people):
+                    accommodation = person.accommodation if person.role == Constants.FELLOW else None
+                    puts(row_format.format(i + 1, person.id, person.name.strip(), person.role,
+                                           accommodation or "----"))
+
+            for line_number, error in errors:
+                puts("Skipped line {}: {}".format(line_number, error))
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_save_state(self, args):
@@ -314,7 +453,7 @@ class AmityRun(cmd.Cmd):
             if amity.save_state(db_path):
                 puts("Successfully saved state to file {}".format(db_name))
         except Exception as ex:
-            puts("Error: " + ex.message)
+            self.fail("Error: " + str(ex))
 
     @docopt_cmd
     def do_load_state(self, args):
@@ -327,12 +466,96 @@ class AmityRun(cmd.Cmd):
 
         try:
             db_path = os.path.dirname(os.path.realpath(__file__)) + "/" + db_name
+            journaled = amity.snapshot_db if amity.journal is not None else None
             if amity.load_state(db_path):
                 print("Successfully loaded state from {}".format(db_name))
+                if journaled:
+                    print("Stopped journaling to {}".format(Journal.path_for(journaled)))
             else:
                 raise Exception("Failed to load data from {}".format(db_name))
         except Exception as ex:
-            print(ex.message)
+            self.fail(str(ex))
+
+    @docopt_cmd
+    def do_recover(self, args):
+        """
+            Usage: recover [--db=sqlite_database] [--sync=<count>]
+        """
+        db_name = args['--db'] or "amity.sqlite"
+
+        try:
+            sync_every = get_number(args, '--sync', SYNC_EVERY)
+            db_path = os.path.dirname(os.path.realpath(__file__)) + "/" + db_name
+            replayed = amity.recover(db_path, sync_every=sync_every)
+            puts("Recovered {} rooms and {} people from {}, replayed {} journal records".format(
+                len(amity.rooms), len(amity.people), db_name, replayed))
+            puts("Journaling changes to {}".format(Journal.path_for(db_name)))
+        except Exception as ex:
+            self.fail("Error: " + str(ex))
+
+    @docopt_cmd
+    def do_compact(self, args):
+        """
+            Usage: compact
+        """
+        try:
+            amity.compact()
+            puts("Folded journal into {}".format(amity.snapshot_db))
+        except Exception as ex:
+            self.fail("Error: " + str(ex))
+
+    @docopt_cmd
+    def do_stats(self, args):
+        """
+            Usage: stats [(on|off|reset)] [--json=<file_name>]
+        """
+        from tabulate import tabulate
+
+        try:
+            if args['on']:
+                amity.enable_stats()
+                puts("Collecting operation stats")
+            elif args['off']:
+                amity.disable_stats()
+                puts("Stopped collecting operation stats")
+            elif amity.stats is None:
+                raise ValueError("stats are off, turn them on with: stats on")
+            elif args['reset']:
+                amity.stats.reset()
+                puts("Cleared operation stats")
+            elif args['--json']:
+                file_name = os.path.dirname(os.path.realpath(__file__)) + "/" + args['--json']
+                amity.stats.dump(file_name)
+                puts("Successfully wrote stats to {}".format(file_name))
+            else:
+                data = amity.stats.to_dict()
+                rows = [[name, operation['count'], operation['total'] * 1e3] +
+                        [operation[key] * 1e6 for key in ('mean', 'p50', 'p90', 'p99', 'max')]
+                        for name, operation in sorted(data['operations'].items())]
+                with indent(4):
+                    puts(tabulate(rows, headers=['OPERATION', 'CALLS', 'TOTAL ms', 'MEAN us', 'P50 us', 'P90 us',
+                                                 'P99 us', 'MAX us'], tablefmt='orgtbl', floatfmt='.1f'))
+                    for name, rooms in sorted(data['room_scans'].items()):
+                        puts("{} scanned {} rooms".format(name, rooms))
+        except Exception as ex:
+            self.fail("Error: " + str(ex))
+
+    @docopt_cmd
+    def do_strategy(self, args):
+        """
+            Usage: strategy [<name>] [--seed=<seed>]
+        """
+        try:
+            if args['<name>']:
+                amity.set_strategy(args['<name>'].lower(), seed=get_number(args, '--seed'))
+            puts("Allocating rooms by {}".format(amity.strategy))
+        except Exception as ex:
+            self.fail("Error: " + str(ex))
+
+    def postcmd(self, stop, line):
+        # every command's changes reach the journal before the next prompt
+        amity.commit()
+        return stop
 
     def do_clear(self, arg):
         """Clears screen>"""
@@ -343,10 +566,34 @@ class AmityRun(cmd.Cmd):
         """Quits out of Interactive Mode."""
 
         print('Good Bye!')
+        amity.close()
         exit()
 
 
-opt = docopt(__doc__, sys.argv[1:])
+if __name__ == '__main__':
+    opt = docopt(__doc__, sys.argv[1:])
+    try:
+        amity.set_strategy(opt['--strategy'])
+    except ValueError as ex:
+        sys.exit(str(ex))
 
-if opt['--interactive']:
-    AmityRun().cmdloop()
+    if opt['--interactive']:
+        AmityRun().cmdloop()
+    elif opt['--script']:
+        try:
+            summary = AmityRun().run_script(opt['--script'], stop_on_error=opt['--stop-on-error'])
+        finally:
+            amity.close()
+        sys.exit(1 if summary['failed'] else 0)
+    elif opt['--serve']:
+        # the service is written with async/await, it does not even compile on older pythons
+        if sys.version_info < (3, 7):
+            sys.exit("--serve requires Python 3.7+")
+        from mod_amity.service import serve
+
+        if opt['--db']:
+            amity.recover(os.path.dirname(os.path.realpath(__file__)) + "/" + opt['--db'])
+        try:
+            serve(amity, opt['--host'], int(opt['--port']))
+        finally:
+            amity.close()